@@ -0,0 +1,332 @@
+"""
+In-memory audio decoding
+Decodes MP3, WAV, FLAC and OGG straight from a bytes-like buffer; nothing is
+ever written to disk
+
+Fallback order (DECODER_ORDER), each tried only if installed:
+  1. soundfile  - libsndfile >= 1.1 reads MP3 as well as WAV/FLAC/OGG; fastest
+  2. torchaudio - for codecs the installed libsndfile lacks
+  3. wave       - standard library, uncompressed PCM WAV only; always present
+
+The container is sniffed from its magic bytes first and only the decoders
+able to read it are tried (FORMAT_DECODERS), starting with the one that last
+succeeded for that format. A decoder that keeps failing on a format is
+moved to the back of that format's chain for a while, so a broken backend
+does not cost an extra decode attempt per clip. benchmark_decoders() can reorder the chains
+by measured speed at start-up.
+
+Headerless pcm_s16le (fmt="pcm_s16le" plus its sample rate) skips the
+decoders entirely: the buffer is viewed with np.frombuffer and scaled once.
+
+decode_audio(max_seconds=...) stops decoding once the leading window is read:
+libsndfile and torchaudio decode MP3 frame by frame, so the rest of a long
+upload is never decompressed (nor resampled by the callers).
+"""
+
+import io
+import os
+import time
+import wave
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+try:
+    import torchaudio
+    TORCHAUDIO_AVAILABLE = True
+except ImportError:
+    TORCHAUDIO_AVAILABLE = False
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+DECODER_ORDER = ("soundfile", "torchaudio", "wave")
+
+# Decoders worth trying per sniffed container, fastest first (see benchmark_decoders)
+FORMAT_DECODERS: Dict[str, Tuple[str, ...]] = {
+    "mp3": ("soundfile", "torchaudio"),
+    "wav": ("soundfile", "wave", "torchaudio"),
+    "flac": ("soundfile", "torchaudio"),
+    "ogg": ("soundfile", "torchaudio"),
+    "unknown": DECODER_ORDER,
+}
+
+# Consecutive failures after which a decoder is demoted for a format, and for how long
+DECODER_FAILURE_LIMIT = int(os.environ.get("DECODER_FAILURE_LIMIT", "3"))
+DECODER_SUSPEND_SECONDS = float(os.environ.get("DECODER_SUSPEND_SECONDS", "60"))
+
+# Per-format decoder that last succeeded, consecutive failures and suspensions
+# (guarded by _order_lock: with DETECTION_WORKERS=0 decodes run on a thread pool)
+_preferred: Dict[str, str] = {}
+_failures: Dict[Tuple[str, str], int] = {}
+_suspended_until: Dict[Tuple[str, str], float] = {}
+_order_lock = threading.Lock()
+
+
+class DecodeError(ValueError):
+    """No decoder could read the payload"""
+
+
+def sniff_format(buffer: BytesLike) -> str:
+    """Container from the magic bytes: "mp3", "wav", "flac", "ogg" or "unknown" """
+    head = bytes(buffer[:12])
+    if head[:3] == b"ID3":
+        return "mp3"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        return "ogg"
+    # MPEG audio frame sync (11 set bits) with a non-reserved layer; layer bits 00 would be ADTS AAC
+    if len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0 and (head[1] & 0x06):
+        return "mp3"
+    return "unknown"
+
+
+def _frame_budget(max_seconds: Optional[float], sr: int) -> int:
+    """Frames to read for a max_seconds window; -1 reads everything"""
+    return int(max_seconds * sr) if max_seconds else -1
+
+
+def _decode_soundfile(buffer: BytesLike, dtype: str, max_seconds: Optional[float] = None) -> Tuple[np.ndarray, int]:
+    # SoundFile.read rather than sf.read: the same read path as librosa.load,
+    # whose MP3 output sf.read can differ from by an ulp
+    with sf.SoundFile(io.BytesIO(buffer)) as audio_file:
+        frames = _frame_budget(max_seconds, audio_file.samplerate)
+        return audio_file.read(frames=frames, dtype=dtype, always_2d=True), audio_file.samplerate
+
+
+def _decode_torchaudio(buffer: BytesLike, dtype: str, max_seconds: Optional[float] = None) -> Tuple[np.ndarray, int]:
+    frames = -1
+    if max_seconds:
+        frames = _frame_budget(max_seconds, torchaudio.info(io.BytesIO(buffer)).sample_rate)
+    waveform, sr = torchaudio.load(io.BytesIO(buffer), num_frames=frames)
+    return waveform.numpy().T.astype(dtype, copy=False), sr
+
+
+def _decode_wave(buffer: BytesLike, dtype: str, max_seconds: Optional[float] = None) -> Tuple[np.ndarray, int]:
+    with wave.open(io.BytesIO(buffer), "rb") as wav:
+        sr = wav.getframerate()
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        budget = _frame_budget(max_seconds, sr)
+        frames = wav.readframes(wav.getnframes() if budget < 0 else min(budget, wav.getnframes()))
+    if width == 1:  # 8-bit WAV is unsigned
+        y = (np.frombuffer(frames, dtype=np.uint8).astype(dtype) - 128) / 128
+    elif width in (2, 4):
+        y = np.frombuffer(frames, dtype=f"<i{width}").astype(dtype) / float(2 ** (8 * width - 1))
+    else:
+        raise DecodeError(f"Unsupported WAV sample width: {width} bytes")
+    return y.reshape(-1, channels), sr
+
+
+def decode_pcm_s16le(buffer: BytesLike, sample_rate: int, dtype: str = "float32",
+                     max_seconds: Optional[float] = None) -> np.ndarray:
+    """Scale headerless little-endian int16 mono PCM to [-1, 1) in one pass, without copying the input"""
+    count = len(buffer) // 2
+    budget = _frame_budget(max_seconds, sample_rate)
+    if budget >= 0:
+        count = min(count, budget)
+    pcm = np.frombuffer(buffer, dtype="<i2", count=count)
+    y = np.empty(count, dtype=dtype)
+    np.multiply(pcm, np.dtype(dtype).type(1 / 32768), out=y)
+    return y
+
+
+DECODERS: Dict[str, Tuple[bool, Callable[..., Tuple[np.ndarray, int]]]] = {
+    "soundfile": (SOUNDFILE_AVAILABLE, _decode_soundfile),
+    "torchaudio": (TORCHAUDIO_AVAILABLE, _decode_torchaudio),
+    "wave": (True, _decode_wave),
+}
+
+
+class DecoderStats:
+    """
+    Thread-safe per-decoder attempt counts and timings
+    Worker processes drain() their counters into each result and the API
+    process merge()s them, so /metrics sees every decode
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        return self._stats.setdefault(name, {"attempts": 0, "successes": 0, "failures": 0, "seconds": 0.0})
+
+    def record(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            entry = self._entry(name)
+            entry["attempts"] += 1
+            entry["successes" if ok else "failures"] += 1
+            entry["seconds"] += seconds
+
+    def drain(self) -> Dict[str, Dict[str, float]]:
+        """Return the counters gathered since the last drain and reset them"""
+        with self._lock:
+            drained, self._stats = self._stats, {}
+            return drained
+
+    def merge(self, delta: Dict[str, Dict[str, float]]):
+        with self._lock:
+            for name, counts in delta.items():
+                entry = self._entry(name)
+                for key, value in counts.items():
+                    entry[key] += value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            decoded = sum(entry["successes"] for entry in self._stats.values())
+            return {
+                name: {
+                    "attempts": entry["attempts"],
+                    "successes": entry["successes"],
+                    "failures": entry["failures"],
+                    "mean_ms": round(1000 * entry["seconds"] / entry["attempts"], 3) if entry["attempts"] else 0.0,
+                    "share_of_decodes": round(entry["successes"] / decoded, 4) if decoded else 0.0,
+                }
+                for name, entry in self._stats.items()
+            }
+
+
+# Decodes done in this process; detect_in_worker ships them back with each result
+DECODER_STATS = DecoderStats()
+
+
+def decoder_order(fmt: str) -> List[str]:
+    """
+    Decoders to try for a sniffed format: the last winner first and
+    suspended ones last (demoted, never dropped, so a valid clip still decodes)
+    """
+    candidates = [name for name in FORMAT_DECODERS.get(fmt, DECODER_ORDER) if DECODERS[name][0]]
+    now = time.monotonic()
+    with _order_lock:
+        preferred = _preferred.get(fmt)
+        suspended = {name for name in candidates if _suspended_until.get((fmt, name), 0.0) > now}
+    # Stable sort keeps the FORMAT_DECODERS order within each group
+    candidates.sort(key=lambda name: (name != preferred, name in suspended))
+    return candidates
+
+
+def _note_outcome(fmt: str, winner: str, losers: List[str]):
+    """Count the failures a winning decoder overcame and reset its own, in one locked step"""
+    with _order_lock:
+        for loser in losers:
+            _note_result(fmt, loser, ok=False)
+        _note_result(fmt, winner, ok=True)
+
+
+def _note_result(fmt: str, name: str, ok: bool):
+    """Update one decoder's failure count and suspension; the caller holds _order_lock"""
+    key = (fmt, name)
+    if ok:
+        _preferred[fmt] = name
+        _failures.pop(key, None)
+        _suspended_until.pop(key, None)
+        return
+    _failures[key] = _failures.get(key, 0) + 1
+    if _failures[key] >= DECODER_FAILURE_LIMIT:
+        logger.warning(f"Suspending {name} for {fmt} after {_failures[key]} consecutive failures")
+        _suspended_until[key] = time.monotonic() + DECODER_SUSPEND_SECONDS
+        _failures[key] = 0
+
+
+def decode_audio(buffer: BytesLike, dtype: str = "float32", fmt: Optional[str] = None,
+                 max_seconds: Optional[float] = None, sample_rate: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    Decode an in-memory audio file to mono samples at the native sample rate
+    Only the first max_seconds are decoded when given (None or 0: the whole file)
+    fmt="pcm_s16le" reads headerless PCM at sample_rate; anything else tries
+    decoder_order() for the sniffed (or given) format. Raises DecodeError if
+    nothing can read the buffer
+    """
+    if fmt == "pcm_s16le":
+        if not sample_rate:
+            raise DecodeError("pcm_s16le audio needs a sample rate")
+        started = time.perf_counter()
+        y = decode_pcm_s16le(buffer, sample_rate, dtype, max_seconds)
+        DECODER_STATS.record("pcm", time.perf_counter() - started, ok=y.size > 0)
+        if y.size == 0:
+            raise DecodeError("Could not decode pcm_s16le audio: no samples")
+        return y, sample_rate
+    fmt = fmt or sniff_format(buffer)
+    errors = []
+    failed = []
+    for name in decoder_order(fmt):
+        decoder = DECODERS[name][1]
+        started = time.perf_counter()
+        try:
+            y, sr = decoder(buffer, dtype, max_seconds)
+            if y.size == 0:
+                raise DecodeError("no samples")
+        except Exception as e:
+            DECODER_STATS.record(name, time.perf_counter() - started, ok=False)
+            failed.append(name)
+            errors.append(f"{name}: {e}")
+            continue
+        DECODER_STATS.record(name, time.perf_counter() - started, ok=True)
+        # A failure only counts against a decoder when another one read the same
+        # buffer; a corrupt upload that nothing decodes must not suspend anyone
+        _note_outcome(fmt, name, failed)
+        # Average channels to mono (same as librosa.to_mono)
+        y = y[:, 0] if y.shape[1] == 1 else np.mean(y, axis=1)
+        return y, sr
+    raise DecodeError(f"Could not decode {fmt} audio: " + "; ".join(errors))
+
+
+def _benchmark_samples(seconds: float = 1.0, sr: int = 16000) -> Dict[str, bytes]:
+    """Short synthetic clip encoded in every container the installed soundfile can write"""
+    t = np.arange(int(seconds * sr)) / sr
+    tone = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    samples = {}
+    pcm = io.BytesIO()
+    with wave.open(pcm, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sr)
+        wav.writeframes((tone * 32767).astype("<i2").tobytes())
+    samples["wav"] = pcm.getvalue()
+    if SOUNDFILE_AVAILABLE:
+        for fmt, (container, subtype) in {"flac": ("FLAC", None), "ogg": ("OGG", "VORBIS"),
+                                          "mp3": ("MP3", "MPEG_LAYER_III")}.items():
+            encoded = io.BytesIO()
+            try:
+                sf.write(encoded, tone, sr, format=container, subtype=subtype)
+                samples[fmt] = encoded.getvalue()
+            except Exception as e:
+                logger.info(f"Cannot encode a {fmt} benchmark sample: {e}")
+    return samples
+
+
+def benchmark_decoders(repeats: int = 3) -> Dict[str, List[str]]:
+    """
+    Time every available decoder on a synthetic clip per format and reorder
+    FORMAT_DECODERS fastest first; decoders that fail go last
+    """
+    for fmt, sample in _benchmark_samples().items():
+        timings = {}
+        for name in FORMAT_DECODERS[fmt]:
+            available, decoder = DECODERS[name]
+            if not available:
+                continue
+            try:
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    decoder(sample, "float32")
+                timings[name] = (time.perf_counter() - started) / repeats
+            except Exception:
+                timings[name] = float("inf")
+        FORMAT_DECODERS[fmt] = tuple(sorted(FORMAT_DECODERS[fmt], key=lambda name: timings.get(name, float("inf"))))
+        logger.info(f"Decoder order for {fmt}: {FORMAT_DECODERS[fmt]} "
+                    f"({', '.join(f'{k}={v * 1000:.2f}ms' for k, v in timings.items())})")
+    return {fmt: list(order) for fmt, order in FORMAT_DECODERS.items()}
@@ -0,0 +1,237 @@
+"""
+Header-only audio probing
+Pure-Python parsing of MP3 frame headers (with Xing/Info and VBRI tags),
+RIFF/WAVE and FLAC STREAMINFO: sample rate, channels, bitrate and duration
+in microseconds, without decoding a single sample
+"""
+
+import struct
+from typing import Any, Dict, Optional
+
+from audio_decoding import sniff_format
+
+# Bytes scanned for the first MPEG frame after any ID3v2 tag
+SYNC_SEARCH_BYTES = 64 * 1024
+
+# Frames walked to average the bitrate of a stream without a Xing/VBRI tag
+BITRATE_SAMPLE_FRAMES = 64
+
+# Bitrates in kbps by (MPEG version 1 or 2/2.5, layer); index 0 is free format, 15 is invalid
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {"1": (44100, 48000, 32000), "2": (22050, 24000, 16000), "2.5": (11025, 12000, 8000)}
+_VERSIONS = {0b00: "2.5", 0b10: "2", 0b11: "1"}
+_LAYERS = {0b01: 3, 0b10: 2, 0b11: 1}
+
+
+class ProbeError(ValueError):
+    """Headers are missing or inconsistent; the payload cannot be decoded"""
+
+
+def _parse_frame_header(buffer: bytes, offset: int) -> Optional[Dict[str, Any]]:
+    """Decode the 4-byte MPEG audio header at offset, or None if it is not one"""
+    if offset + 4 > len(buffer):
+        return None
+    b0, b1, b2, b3 = buffer[offset:offset + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = _VERSIONS.get((b1 >> 3) & 0x03)
+    layer = _LAYERS.get((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version is None or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    bitrate = _BITRATES[(1 if version == "1" else 2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    samples_per_frame = 384 if layer == 1 else (1152 if layer == 2 or version == "1" else 576)
+    if layer == 1:
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        frame_length = samples_per_frame // 8 * bitrate // sample_rate + padding
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": 1 if (b3 >> 6) == 0b11 else 2,
+        "samples_per_frame": samples_per_frame,
+        "frame_length": frame_length,
+    }
+
+
+def _id3v2_size(buffer: bytes) -> int:
+    """Length of a leading ID3v2 tag (0 if none); the size field is synchsafe"""
+    if len(buffer) < 10 or buffer[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in buffer[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if buffer[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _mean_bitrate(buffer: bytes, offset: int, end: int, header: Dict[str, Any]) -> int:
+    """Average bitrate over up to BITRATE_SAMPLE_FRAMES frames (exact for CBR, an estimate for untagged VBR)"""
+    total, count = 0, 0
+    while count < BITRATE_SAMPLE_FRAMES and header is not None:
+        total += header["bitrate"]
+        count += 1
+        offset += header["frame_length"]
+        header = _parse_frame_header(buffer, offset) if offset < end else None
+    return total // count
+
+
+def probe_mp3(buffer: bytes) -> Dict[str, Any]:
+    """
+    Parse the first MPEG frame and any Xing/Info or VBRI tag in it
+    Raises ProbeError when no pair of consistent frame headers is found
+    """
+    start = _id3v2_size(buffer)
+    end = len(buffer)
+    if end >= 128 and buffer[-128:-125] == b"TAG":  # ID3v1 trailer
+        end -= 128
+
+    header = None
+    offset = buffer.find(b"\xff", start, start + SYNC_SEARCH_BYTES)
+    while 0 <= offset < start + SYNC_SEARCH_BYTES:
+        header = _parse_frame_header(buffer, offset)
+        if header is not None:
+            # A real frame is followed by another with the same layout (or by the end of the data)
+            following = offset + header["frame_length"]
+            if following >= end:
+                break
+            successor = _parse_frame_header(buffer, following)
+            if successor is not None and all(successor[key] == header[key] for key in
+                                             ("version", "layer", "sample_rate")):
+                break
+        header = None
+        offset = buffer.find(b"\xff", offset + 1, start + SYNC_SEARCH_BYTES)
+    if header is None:
+        raise ProbeError("no MPEG audio frame found")
+
+    frames = None
+    audio_bytes = end - offset
+    vbr_tag = None
+    mono = header["channels"] == 1
+    side_info = (17 if mono else 32) if header["version"] == "1" else (9 if mono else 17)
+    xing = offset + 4 + side_info
+    if buffer[xing:xing + 4] in (b"Xing", b"Info"):
+        vbr_tag = buffer[xing:xing + 4].decode()
+        flags = struct.unpack(">I", buffer[xing + 4:xing + 8])[0] if xing + 8 <= end else 0
+        field = xing + 8
+        if flags & 0x1 and field + 4 <= end:
+            frames = struct.unpack(">I", buffer[field:field + 4])[0]
+            field += 4
+        if flags & 0x2 and field + 4 <= end:
+            audio_bytes = struct.unpack(">I", buffer[field:field + 4])[0] or audio_bytes
+    elif buffer[offset + 36:offset + 40] == b"VBRI" and offset + 54 <= end:
+        vbr_tag = "VBRI"
+        audio_bytes, frames = struct.unpack(">II", buffer[offset + 46:offset + 54])
+
+    if frames:
+        duration = frames * header["samples_per_frame"] / header["sample_rate"]
+        bitrate = int(audio_bytes * 8 / duration) if duration > 0 else header["bitrate"]
+    else:
+        # No frame count: the stream length over the mean bitrate of the first frames
+        bitrate = _mean_bitrate(buffer, offset, end, header)
+        duration = audio_bytes * 8 / bitrate
+
+    return {
+        "format": "mp3",
+        "version": header["version"],
+        "layer": header["layer"],
+        "sample_rate": header["sample_rate"],
+        "channels": header["channels"],
+        "bitrate": bitrate,
+        "vbr_tag": vbr_tag,
+        "frames": frames,
+        "audio_offset": offset,
+        "duration_seconds": round(duration, 3),
+    }
+
+
+def probe_wav(buffer: bytes) -> Dict[str, Any]:
+    """Read the fmt and data chunk headers of a RIFF/WAVE file"""
+    offset, fmt, data_size = 12, None, None
+    while offset + 8 <= len(buffer) and (fmt is None or data_size is None):
+        chunk_id, chunk_size = buffer[offset:offset + 4], struct.unpack("<I", buffer[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt " and offset + 24 <= len(buffer):
+            fmt = struct.unpack("<HHIIHH", buffer[offset + 8:offset + 24])
+        elif chunk_id == b"data":
+            # Streams written without a known length carry 0 or 0xFFFFFFFF here
+            data_size = min(chunk_size, len(buffer) - offset - 8) if chunk_size not in (0, 0xFFFFFFFF) \
+                else len(buffer) - offset - 8
+        offset += 8 + chunk_size + (chunk_size & 1)
+    if fmt is None or data_size is None:
+        raise ProbeError("WAV without fmt or data chunk")
+    _, channels, sample_rate, byte_rate, _, bits = fmt
+    if not channels or not sample_rate or not byte_rate:
+        raise ProbeError("WAV with an empty fmt chunk")
+    return {
+        "format": "wav",
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "bits_per_sample": bits,
+        "bitrate": byte_rate * 8,
+        "duration_seconds": round(data_size / byte_rate, 3),
+    }
+
+
+def probe_flac(buffer: bytes) -> Dict[str, Any]:
+    """Read STREAMINFO, the mandatory first metadata block of a FLAC stream"""
+    if len(buffer) < 42 or buffer[4] & 0x7F != 0:
+        raise ProbeError("FLAC without STREAMINFO")
+    packed = int.from_bytes(buffer[18:26], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x07) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate:
+        raise ProbeError("FLAC with a zero sample rate")
+    return {
+        "format": "flac",
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "bits_per_sample": ((packed >> 36) & 0x1F) + 1,
+        "duration_seconds": round(total_samples / sample_rate, 3) if total_samples else None,
+    }
+
+
+def probe_pcm_s16le(buffer: bytes, sample_rate: Optional[int]) -> Dict[str, Any]:
+    """Headerless 16-bit mono PCM: the duration follows from the length and the stated rate"""
+    if not sample_rate:
+        raise ProbeError("pcm_s16le audio needs a sample rate")
+    if len(buffer) % 2:
+        raise ProbeError("pcm_s16le audio with an odd number of bytes")
+    return {
+        "format": "pcm_s16le",
+        "sample_rate": sample_rate,
+        "channels": 1,
+        "bits_per_sample": 16,
+        "bitrate": sample_rate * 16,
+        "duration_seconds": round(len(buffer) / 2 / sample_rate, 3),
+    }
+
+
+def probe_audio(buffer: bytes, fmt: Optional[str] = None, sample_rate: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Probe any supported container, or headerless PCM when fmt="pcm_s16le";
+    duration_seconds is None when the headers do not state it (Ogg).
+    Raises ProbeError for broken headers
+    """
+    if fmt == "pcm_s16le":
+        return probe_pcm_s16le(buffer, sample_rate)
+    fmt = sniff_format(buffer)
+    if fmt == "mp3":
+        return probe_mp3(buffer)
+    if fmt == "wav":
+        return probe_wav(buffer)
+    if fmt == "flac":
+        return probe_flac(buffer)
+    return {"format": fmt, "duration_seconds": None}
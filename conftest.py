@@ -0,0 +1,28 @@
+"""
+Shared pytest fixtures for the test_*.py suites
+"""
+import io
+import wave
+
+import numpy as np
+import pytest
+
+# Manual scripts run against a live server or print a walkthrough; they are not pytest suites
+collect_ignore = ["test_api.py", "quick_test.py", "simple_test.py", "final_test.py"]
+
+
+def encode_wav(samples: np.ndarray, sr: int, channels: int = 1) -> bytes:
+    """16-bit PCM WAV of mono float samples in [-1, 1], duplicated across channels"""
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sr)
+        wav.writeframes(np.repeat(pcm, channels).tobytes())
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_wav():
+    return encode_wav
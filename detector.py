@@ -3,10 +3,9 @@ Advanced AI Voice Detection Engine
 Multi-technique ensemble approach for high accuracy detection
 """
 
-import io
 import numpy as np
 import logging
-from typing import Tuple, Literal, Dict, List
+from typing import Tuple, Literal, Dict, List, Optional, Iterable
 import warnings
 import hashlib
 
@@ -24,21 +23,278 @@ except ImportError:
 
 try:
     from scipy import stats, signal
-    from scipy.fft import fft, fftfreq
     from scipy.ndimage import uniform_filter1d
     SCIPY_AVAILABLE = True
 except ImportError:
     SCIPY_AVAILABLE = False
     logger.warning("scipy not available")
 
-# Try to import deep learning libraries
-try:
-    import torch
-    import torchaudio
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
-    logger.warning("torch/torchaudio not available")
+from audio_decoding import decode_audio, DecodeError
+from resampling import resample
+from dsp_kernels import (HPSS_KERNEL, SPECTRAL_BLOCKS, WaveformMoments, analytic_envelope, autocorrelation, dominant_pitch, fft_frequencies,
+                         formant_peaks, frame, frame_max_abs, frame_rms, hpss_masks, low_frequency_bins,
+                         spectral_descriptors)
+
+
+class AnalysisContext:
+    """
+    Per-clip cache of spectral intermediates shared by all analysis stages
+    Everything is computed lazily on first access and memoized, so each
+    transform runs at most once per (n_fft, hop_length) no matter how many
+    stages read it
+    """
+
+    def __init__(self, y: np.ndarray, sr: int, n_fft: int = 2048, hop_length: int = 512, n_mels: int = 128,
+                 hpss_kernel: int = HPSS_KERNEL, hpss_max_freq: Optional[float] = None):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.hpss_kernel = hpss_kernel
+        self.hpss_max_freq = hpss_max_freq
+        self._cache = {}
+
+    def _memo(self, key, compute):
+        """Return cached value for key, computing it on first use"""
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _resolve(self, n_fft, hop_length) -> Tuple[int, int]:
+        return (n_fft or self.n_fft, hop_length or self.hop_length)
+
+    def stft(self, n_fft: int = None, hop_length: int = None) -> np.ndarray:
+        """Complex STFT"""
+        n_fft, hop_length = self._resolve(n_fft, hop_length)
+        return self._memo(('stft', n_fft, hop_length),
+                          lambda: librosa.stft(self.y, n_fft=n_fft, hop_length=hop_length))
+
+    def magnitude(self, n_fft: int = None, hop_length: int = None) -> np.ndarray:
+        """Magnitude spectrogram |STFT|"""
+        n_fft, hop_length = self._resolve(n_fft, hop_length)
+        return self._memo(('magnitude', n_fft, hop_length),
+                          lambda: np.abs(self.stft(n_fft, hop_length)))
+
+    def power(self, n_fft: int = None, hop_length: int = None) -> np.ndarray:
+        """Power spectrogram |STFT|^2"""
+        n_fft, hop_length = self._resolve(n_fft, hop_length)
+        return self._memo(('power', n_fft, hop_length),
+                          lambda: self.magnitude(n_fft, hop_length) ** 2)
+
+    def mel(self) -> np.ndarray:
+        """Mel power spectrogram at the default resolution"""
+        return self._memo('mel', lambda: librosa.feature.melspectrogram(
+            S=self.power(), sr=self.sr, n_fft=self.n_fft, hop_length=self.hop_length, n_mels=self.n_mels))
+
+    def log_mel(self) -> np.ndarray:
+        """Mel spectrogram in dB (input to MFCC and onset strength)"""
+        return self._memo('log_mel', lambda: librosa.power_to_db(self.mel()))
+
+    def onset_envelope(self) -> np.ndarray:
+        """Onset strength envelope derived from the shared mel spectrogram"""
+        return self._memo('onset_envelope', lambda: librosa.onset.onset_strength(
+            S=self.log_mel(), sr=self.sr, hop_length=self.hop_length))
+
+    def onset_times(self) -> np.ndarray:
+        """Onset times in seconds, peak-picked once from the shared onset envelope"""
+        return self._memo('onset_times', lambda: librosa.onset.onset_detect(
+            onset_envelope=self.onset_envelope(), sr=self.sr, hop_length=self.hop_length, units='time'))
+
+    def rms(self, frame_length: int = None, hop_length: int = None) -> np.ndarray:
+        """Frame-wise RMS energy of the waveform"""
+        frame_length, hop_length = self._resolve(frame_length, hop_length)
+        return self._memo(('rms', frame_length, hop_length), lambda: librosa.feature.rms(
+            y=self.y, frame_length=frame_length, hop_length=hop_length)[0])
+
+    def hpss(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Harmonic and percussive STFTs (median-filter soft masks) at the default resolution"""
+        def compute():
+            max_bin = None
+            if self.hpss_max_freq is not None:
+                max_bin = int(np.searchsorted(fft_frequencies(self.sr, self.n_fft), self.hpss_max_freq))
+            mask_harm, mask_perc = hpss_masks(self.magnitude(), self.hpss_kernel, max_bin)
+            D = self.stft()
+            return D * mask_harm, D * mask_perc
+        return self._memo('hpss', compute)
+
+    def harmonic(self) -> np.ndarray:
+        """Harmonic component of the waveform"""
+        return self._memo('harmonic', lambda: librosa.istft(
+            self.hpss()[0], n_fft=self.n_fft, hop_length=self.hop_length, length=len(self.y)))
+
+    def percussive(self) -> np.ndarray:
+        """Percussive component of the waveform"""
+        return self._memo('percussive', lambda: librosa.istft(
+            self.hpss()[1], n_fft=self.n_fft, hop_length=self.hop_length, length=len(self.y)))
+
+    def envelope(self) -> np.ndarray:
+        """Hilbert amplitude envelope of the waveform, computed in bounded-memory chunks"""
+        return self._memo('envelope', lambda: analytic_envelope(self.y))
+
+    def moments(self) -> WaveformMoments:
+        """Mean, central moments and extrema of the waveform from one chunked pass"""
+        return self._memo('moments', lambda: WaveformMoments.of(self.y))
+
+    def voiced_pitch(self, n_fft: int = None, hop_length: int = None) -> np.ndarray:
+        """Dominant pitch of every frame, keeping only frames in the voice range (50-500 Hz)"""
+        n_fft, hop_length = self._resolve(n_fft, hop_length)
+
+        def compute():
+            f0 = dominant_pitch(self.magnitude(n_fft, hop_length), self.sr, n_fft)
+            return f0[(f0 > 50) & (f0 < 500)]
+        return self._memo(('voiced_pitch', n_fft, hop_length), compute)
+
+
+# Feature registry: for every analysis stage, the blocks of features it can
+# produce and the context intermediates each block reads. Stages only run
+# the blocks that produce a requested feature, and the context only computes
+# the intermediates those blocks touch.
+FEATURE_REGISTRY: Dict[str, Dict[str, Dict[str, Tuple[str, ...]]]] = {
+    'analyze_spectral_artifacts': {
+        'smoothness': {'features': ('spectral_smoothness',), 'needs': ('magnitude',)},
+        'band_energy': {'features': ('band_energy_std', 'band_energy_range'), 'needs': ('magnitude',)},
+        'high_low_ratio': {'features': ('high_low_freq_ratio',), 'needs': ('magnitude',)},
+        'flux': {'features': ('spectral_flux_mean', 'spectral_flux_std', 'spectral_flux_max'), 'needs': ('magnitude',)},
+        'subband_flux': {'features': tuple(f'subband_flux_{i}_{stat}' for i in range(4) for stat in ('mean', 'std')),
+                         'needs': ('magnitude',)},
+        'centroid': {'features': ('spectral_centroid_mean', 'spectral_centroid_std', 'spectral_centroid_range'),
+                     'needs': ('magnitude',)},
+        'bandwidth': {'features': ('spectral_bandwidth_mean', 'spectral_bandwidth_std'), 'needs': ('magnitude',)},
+        'rolloff': {'features': ('spectral_rolloff_mean', 'spectral_rolloff_std'), 'needs': ('magnitude',)},
+        'flatness': {'features': ('spectral_flatness_mean', 'spectral_flatness_std', 'spectral_flatness_max'),
+                     'needs': ('magnitude',)},
+        'contrast': {'features': ('spectral_contrast_mean', 'spectral_contrast_std'), 'needs': ('magnitude',)},
+    },
+    'analyze_temporal_patterns': {
+        'rms': {'features': ('rms_mean', 'rms_std', 'rms_max', 'rms_min', 'rms_range', 'dynamic_range'),
+                'needs': ('rms',)},
+        'zcr': {'features': ('zcr_mean', 'zcr_std', 'zcr_max', 'zcr_range'), 'needs': ('waveform',)},
+        'autocorr': {'features': ('autocorr_num_peaks', 'autocorr_peak_regularity', 'autocorr_peak_ratio'),
+                     'needs': ('waveform',)},
+        'envelope': {'features': ('envelope_mean', 'envelope_std', 'envelope_roughness',
+                                  'envelope_modulation_energy', 'envelope_irregularity'), 'needs': ('envelope',)},
+        'silence': {'features': ('silence_ratio',), 'needs': ('rms',)},
+        'onsets': {'features': ('onset_strength_mean', 'onset_strength_std', 'num_onsets',
+                                'onset_interval_mean', 'onset_interval_std'), 'needs': ('onset_envelope', 'onset_times')},
+    },
+    'analyze_mfcc_patterns': {
+        'coefficients': {'features': tuple(f'mfcc_{i}_{stat}' for i in range(20) for stat in ('mean', 'std')),
+                         'needs': ('log_mel',)},
+        'overall': {'features': ('mfcc_overall_mean', 'mfcc_overall_std', 'mfcc_overall_var'), 'needs': ('log_mel',)},
+        'delta': {'features': ('mfcc_delta_mean', 'mfcc_delta_std', 'mfcc_delta_max'), 'needs': ('log_mel',)},
+        'delta2': {'features': ('mfcc_delta2_mean', 'mfcc_delta2_std'), 'needs': ('log_mel',)},
+        'correlation': {'features': ('mfcc_corr_mean', 'mfcc_corr_std', 'mfcc_corr_offdiag_mean',
+                                     'mfcc_corr_offdiag_std'), 'needs': ('log_mel',)},
+        'temporal_diff': {'features': ('mfcc_temporal_diff_mean', 'mfcc_temporal_diff_std'), 'needs': ('log_mel',)},
+        'moments': {'features': ('mfcc_skewness', 'mfcc_kurtosis'), 'needs': ('log_mel',)},
+    },
+    'analyze_pitch_and_prosody': {
+        'pitch': {'features': ('pitch_mean', 'pitch_std', 'pitch_median', 'pitch_range', 'pitch_iqr', 'pitch_cv',
+                               'pitch_diff_mean', 'pitch_diff_std', 'pitch_diff_max', 'pitch_jitter',
+                               'pitch_skewness', 'pitch_kurtosis'), 'needs': ('pitch',)},
+        'harmonic': {'features': ('harmonic_mean', 'harmonic_std', 'percussive_mean', 'percussive_std',
+                                  'harmonic_percussive_ratio'), 'needs': ('harmonic', 'percussive')},
+        'spectral_peaks': {'features': ('num_spectral_peaks', 'spectral_peak_spacing_mean',
+                                        'spectral_peak_spacing_std'), 'needs': ('magnitude',)},
+    },
+    'analyze_phase_patterns': {
+        'phase_diff': {'features': ('phase_diff_mean', 'phase_diff_std', 'phase_coherence'), 'needs': ('stft',)},
+        'group_delay': {'features': ('group_delay_std',), 'needs': ('stft',)},
+        'band_coherence': {'features': ('phase_band_coherence_mean', 'phase_band_coherence_std'), 'needs': ('stft',)},
+        'mag_phase': {'features': ('mag_phase_correlation',), 'needs': ('stft', 'magnitude')},
+    },
+    'analyze_noise_patterns': {
+        'noise_floor': {'features': ('noise_floor_mean', 'noise_floor_std', 'snr_estimate'), 'needs': ('magnitude',)},
+        'noise_frames': {'features': ('noise_frame_ratio',), 'needs': ('magnitude',)},
+        'residual': {'features': ('residual_energy', 'residual_ratio', 'residual_variance'), 'needs': ('harmonic',)},
+        'hf_noise': {'features': ('hf_noise_energy', 'hf_noise_ratio'), 'needs': ('waveform',)},
+    },
+    'analyze_statistical_moments': {
+        'moments': {'features': ('signal_mean', 'signal_std', 'signal_var', 'signal_skewness', 'signal_kurtosis'),
+                    'needs': ('moments',)},
+        'peaks': {'features': ('signal_max', 'signal_peak_count', 'crest_factor'), 'needs': ('waveform', 'moments')},
+        'histogram': {'features': ('hist_entropy', 'hist_peak', 'hist_peak_position'), 'needs': ('waveform', 'moments')},
+        'percentiles': {'features': ('signal_p10', 'signal_p90', 'signal_p99', 'signal_iqr'), 'needs': ('waveform',)},
+    },
+    'analyze_micro_modulations': {
+        'shimmer': {'features': ('shimmer', 'shimmer_db', 'apq'), 'needs': ('waveform',)},
+        'micro_pitch': {'features': ('ppq', 'pitch_micro_var'), 'needs': ('pitch_fine',)},
+        'micro_flux': {'features': ('micro_spectral_flux', 'micro_spectral_flux_std'), 'needs': ('magnitude_fine',)},
+        'formants': {'features': ('formant_f1_var', 'formant_f2_var', 'formant_trajectory_var'), 'needs': ('waveform',)},
+    },
+    'analyze_breath_patterns': {
+        'pauses': {'features': ('pause_count', 'pause_rate', 'quiet_energy_mean', 'quiet_energy_var',
+                                'breath_indicator', 'pause_duration_mean', 'pause_duration_var',
+                                'pause_duration_cv'), 'needs': ('rms_fine',)},
+        'onsets': {'features': ('onset_strength_mean', 'onset_strength_var', 'onset_strength_max',
+                                'onset_interval_cv'), 'needs': ('onset_envelope', 'onset_times')},
+    },
+}
+
+# Stage execution order; later stages overwrite duplicate keys from earlier ones
+ANALYSIS_STAGES: List[Tuple[str, str]] = [
+    ('analyze_spectral_artifacts', 'spectral'),
+    ('analyze_temporal_patterns', 'temporal'),
+    ('analyze_mfcc_patterns', 'MFCC'),
+    ('analyze_pitch_and_prosody', 'pitch'),
+    ('analyze_phase_patterns', 'phase'),
+    ('analyze_noise_patterns', 'noise'),
+    ('analyze_statistical_moments', 'statistical'),
+    ('analyze_micro_modulations', 'micro-modulation'),
+    ('analyze_breath_patterns', 'breath pattern'),
+]
+
+
+# Blocks left out of the latency-bound "standard" mode: autocorrelation, HPSS
+# and the residual filter dominate full-mode runtime
+COSTLY_BLOCKS: Dict[str, set] = {
+    'analyze_temporal_patterns': {'autocorr'},
+    'analyze_pitch_and_prosody': {'harmonic'},
+    'analyze_noise_patterns': {'residual'},
+}
+
+# Detection modes served by this engine ("fast" lives in detector_fast.py)
+DETECTOR_MODES = ('standard', 'full')
+
+
+def standard_features(wanted: Iterable[str]) -> set:
+    """Subset of wanted features that can be produced without any costly block"""
+    costly, cheap = set(), set()
+    for stage, _ in ANALYSIS_STAGES:
+        for block, spec in FEATURE_REGISTRY[stage].items():
+            target = costly if block in COSTLY_BLOCKS.get(stage, ()) else cheap
+            target.update(spec['features'])
+    return set(wanted) - (costly - cheap)
+
+
+def plan_feature_blocks(wanted: Optional[Iterable[str]] = None) -> Dict[str, Optional[set]]:
+    """
+    Map each analysis stage to the blocks needed for the wanted features
+    None means every block (full "research" extraction); an empty set means
+    the stage can be skipped entirely
+    """
+    if wanted is None:
+        return {stage: None for stage, _ in ANALYSIS_STAGES}
+
+    wanted = set(wanted)
+    plan = {}
+    for stage, _ in ANALYSIS_STAGES:
+        plan[stage] = {
+            block for block, spec in FEATURE_REGISTRY[stage].items()
+            if wanted.intersection(spec['features'])
+        }
+    return plan
+
+
+def required_intermediates(plan: Dict[str, Optional[set]]) -> set:
+    """Context intermediates touched by a feature plan"""
+    needs = set()
+    for stage, blocks in plan.items():
+        for block, spec in FEATURE_REGISTRY[stage].items():
+            if blocks is None or block in blocks:
+                needs.update(spec['needs'])
+    return needs
 
 
 class AdvancedVoiceAnalyzer:
@@ -52,206 +308,199 @@ class AdvancedVoiceAnalyzer:
         self.hop_length = 512
         self.n_mels = 128
         self.n_mfcc = 40
+        # Median kernel and upper frequency of the shared HPSS; a cutoff (e.g. 4000 Hz)
+        # separates fewer bins at the cost of moving the harmonic features
+        self.hpss_kernel = HPSS_KERNEL
+        self.hpss_max_freq = None
+        # Frames sampled across the clip for the formant variances
+        self.formant_frames = 50
         
-    def load_audio(self, audio_data: bytes) -> Tuple[np.ndarray, int]:
-        """Load audio from bytes with multiple fallback methods"""
-        import tempfile
-        import os
-        
-        logger.info(f"Attempting to load audio: {len(audio_data)} bytes")
-        logger.info(f"First 20 bytes (hex): {audio_data[:20].hex()}")
-        
-        # Method 1: Try librosa with BytesIO
-        if LIBROSA_AVAILABLE:
-            try:
-                audio_buffer = io.BytesIO(audio_data)
-                y, sr = librosa.load(audio_buffer, sr=self.sample_rate, mono=True)
-                if len(y) > 0:
-                    logger.info(f"Librosa BytesIO succeeded: {len(y)} samples")
-                    return y, sr
-            except Exception as e:
-                logger.warning(f"Librosa BytesIO failed: {e}")
-        
-        # Method 2: Try librosa with temp file
-        if LIBROSA_AVAILABLE:
-            try:
-                with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp:
-                    tmp.write(audio_data)
-                    tmp_path = tmp.name
-                
-                y, sr = librosa.load(tmp_path, sr=self.sample_rate, mono=True)
-                os.unlink(tmp_path)
-                if len(y) > 0:
-                    logger.info(f"Librosa temp file succeeded: {len(y)} samples")
-                    return y, sr
-            except Exception as e:
-                logger.warning(f"Librosa temp file failed: {e}")
-                try:
-                    os.unlink(tmp_path)
-                except:
-                    pass
+    def create_context(self, y: np.ndarray, sr: int) -> AnalysisContext:
+        """Create the shared per-clip analysis context at this analyzer's resolution"""
+        return AnalysisContext(y, sr, n_fft=self.n_fft, hop_length=self.hop_length, n_mels=self.n_mels,
+                               hpss_kernel=self.hpss_kernel, hpss_max_freq=self.hpss_max_freq)
+
+    @staticmethod
+    def _wants(blocks: Optional[set], block: str) -> bool:
+        """Whether a stage block should run (None means run everything)"""
+        return blocks is None or block in blocks
+
+    def extract_features(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                         wanted: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Run the analysis stages and merge their features
+        With wanted=None every feature is extracted (research mode); otherwise
+        only the blocks producing a wanted feature run
+        """
+        ctx = ctx or self.create_context(y, sr)
+        plan = plan_feature_blocks(wanted)
+        if wanted is not None:
+            logger.info(f"Feature plan needs intermediates: {sorted(required_intermediates(plan))}")
         
-        # Method 3: Try torchaudio
-        if TORCH_AVAILABLE:
-            try:
-                audio_buffer = io.BytesIO(audio_data)
-                waveform, sr = torchaudio.load(audio_buffer)
-                # Resample if needed
-                if sr != self.sample_rate:
-                    resampler = torchaudio.transforms.Resample(sr, self.sample_rate)
-                    waveform = resampler(waveform)
-                # Convert to mono
-                if waveform.shape[0] > 1:
-                    waveform = torch.mean(waveform, dim=0, keepdim=True)
-                logger.info(f"Torchaudio succeeded: {waveform.squeeze().shape[0]} samples")
-                return waveform.squeeze().numpy(), self.sample_rate
-            except Exception as e:
-                logger.warning(f"Torchaudio failed: {e}")
+        all_features = {}
+        for stage, label in ANALYSIS_STAGES:
+            blocks = plan[stage]
+            if blocks is not None and not blocks:
+                continue
+            logger.info(f"Analyzing {label} features...")
+            stage_features = getattr(self, stage)(y, sr, ctx, blocks)
+            all_features.update(stage_features)
+            logger.info(f"Extracted {len(stage_features)} {label} features")
         
-        # Method 4: Try soundfile directly
-        try:
-            import soundfile as sf
-            audio_buffer = io.BytesIO(audio_data)
-            y, sr = sf.read(audio_buffer)
-            if len(y.shape) > 1:
-                y = np.mean(y, axis=1)  # Convert to mono
-            # Resample if needed
-            if sr != self.sample_rate:
-                y = librosa.resample(y, orig_sr=sr, target_sr=self.sample_rate)
-                sr = self.sample_rate
-            logger.info(f"Soundfile succeeded: {len(y)} samples")
-            return y, sr
-        except Exception as e:
-            logger.warning(f"Soundfile failed: {e}")
+        return all_features
+
+    def load_audio(self, audio_data: bytes, max_seconds: Optional[float] = None,
+                   audio_format: Optional[str] = None, sample_rate: Optional[int] = None) -> Tuple[np.ndarray, int]:
+        """
+        Decode audio in memory (decoder order in audio_decoding) and resample
+        to self.sample_rate; raises DecodeError when no decoder can read it
+        max_seconds caps decoding and resampling to the start of the clip;
+        audio_format="pcm_s16le" with its sample_rate reads headerless PCM
+        """
+        logger.info(f"Attempting to load audio: {len(audio_data)} bytes")
+        logger.info(f"First 20 bytes (hex): {bytes(audio_data[:20]).hex()}")
         
-        raise ValueError("Could not load audio with any available method")
+        y, sr = decode_audio(audio_data, dtype='float32', fmt=audio_format, max_seconds=max_seconds,
+                             sample_rate=sample_rate)
+        if sr != self.sample_rate:
+            # Same resampler librosa.load(sr=...) uses by default
+            if LIBROSA_AVAILABLE:
+                y = librosa.resample(y, orig_sr=sr, target_sr=self.sample_rate, res_type='soxr_hq')
+            else:
+                y = resample(y, sr, self.sample_rate)
+            sr = self.sample_rate
+        logger.info(f"Decoded {len(y)} samples")
+        return y, sr
 
-    def analyze_spectral_artifacts(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_spectral_artifacts(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                                   blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Detect AI-specific spectral artifacts
         AI synthesizers often leave characteristic patterns in the spectrum
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
-            # Compute spectrogram
-            D = np.abs(librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length))
-            D_db = librosa.amplitude_to_db(D, ref=np.max)
+            # All descriptors in one fused pass over the shared magnitude spectrogram
+            wanted = [block for block in SPECTRAL_BLOCKS if self._wants(blocks, block)]
+            desc = spectral_descriptors(ctx.magnitude(), sr, ctx.n_fft, wanted)
             
             # 1. Spectral smoothness - AI tends to be TOO smooth
-            spectral_diff = np.diff(D_db, axis=0)
-            features['spectral_smoothness'] = np.mean(np.abs(spectral_diff))
+            if 'smoothness' in desc:
+                features['spectral_smoothness'] = desc['smoothness']
             
             # 2. Frequency band energy distribution
-            # Split into bands and compare
-            n_bands = 8
-            band_size = D.shape[0] // n_bands
-            band_energies = []
-            for i in range(n_bands):
-                start = i * band_size
-                end = (i + 1) * band_size
-                band_energy = np.mean(D[start:end, :])
-                band_energies.append(band_energy)
-            
-            band_energies = np.array(band_energies)
-            features['band_energy_std'] = np.std(band_energies)
-            features['band_energy_range'] = np.max(band_energies) - np.min(band_energies)
+            if 'band_energy' in desc:
+                band_energies = desc['band_energy']
+                features['band_energy_std'] = np.std(band_energies)
+                features['band_energy_range'] = np.max(band_energies) - np.min(band_energies)
             
             # 3. High frequency content (AI often lacks natural high-freq detail)
-            high_freq_start = int(D.shape[0] * 0.7)
-            high_freq_energy = np.mean(D[high_freq_start:, :])
-            low_freq_energy = np.mean(D[:high_freq_start, :])
-            features['high_low_freq_ratio'] = high_freq_energy / (low_freq_energy + 1e-10)
+            if 'high_low_ratio' in desc:
+                features['high_low_freq_ratio'] = desc['high_low_ratio']
             
             # 4. Spectral flux (rate of change)
-            spectral_flux = np.sqrt(np.sum(np.diff(D, axis=1) ** 2, axis=0))
-            features['spectral_flux_mean'] = np.mean(spectral_flux)
-            features['spectral_flux_std'] = np.std(spectral_flux)
-            features['spectral_flux_max'] = np.max(spectral_flux)
+            if 'flux' in desc:
+                spectral_flux = desc['flux']
+                features['spectral_flux_mean'] = np.mean(spectral_flux)
+                features['spectral_flux_std'] = np.std(spectral_flux)
+                features['spectral_flux_max'] = np.max(spectral_flux)
             
             # 5. Sub-band spectral flux (different frequency regions)
-            for i, (start, end) in enumerate([(0, 0.25), (0.25, 0.5), (0.5, 0.75), (0.75, 1.0)]):
-                start_idx = int(D.shape[0] * start)
-                end_idx = int(D.shape[0] * end)
-                subband_flux = np.sqrt(np.sum(np.diff(D[start_idx:end_idx, :], axis=1) ** 2, axis=0))
-                features[f'subband_flux_{i}_mean'] = np.mean(subband_flux)
-                features[f'subband_flux_{i}_std'] = np.std(subband_flux)
+            if 'subband_flux' in desc:
+                for i, subband_flux in enumerate(desc['subband_flux']):
+                    features[f'subband_flux_{i}_mean'] = np.mean(subband_flux)
+                    features[f'subband_flux_{i}_std'] = np.std(subband_flux)
             
             # 6. Spectral centroid variation
-            spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr, n_fft=self.n_fft, hop_length=self.hop_length)[0]
-            features['spectral_centroid_mean'] = np.mean(spectral_centroid)
-            features['spectral_centroid_std'] = np.std(spectral_centroid)
-            features['spectral_centroid_range'] = np.max(spectral_centroid) - np.min(spectral_centroid)
+            if 'centroid' in desc:
+                spectral_centroid = desc['centroid']
+                features['spectral_centroid_mean'] = np.mean(spectral_centroid)
+                features['spectral_centroid_std'] = np.std(spectral_centroid)
+                features['spectral_centroid_range'] = np.max(spectral_centroid) - np.min(spectral_centroid)
             
             # 7. Spectral bandwidth
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr, n_fft=self.n_fft, hop_length=self.hop_length)[0]
-            features['spectral_bandwidth_mean'] = np.mean(spectral_bandwidth)
-            features['spectral_bandwidth_std'] = np.std(spectral_bandwidth)
+            if 'bandwidth' in desc:
+                features['spectral_bandwidth_mean'] = np.mean(desc['bandwidth'])
+                features['spectral_bandwidth_std'] = np.std(desc['bandwidth'])
             
             # 8. Spectral rolloff (frequency below which 85% of energy is contained)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr, n_fft=self.n_fft, hop_length=self.hop_length)[0]
-            features['spectral_rolloff_mean'] = np.mean(spectral_rolloff)
-            features['spectral_rolloff_std'] = np.std(spectral_rolloff)
+            if 'rolloff' in desc:
+                features['spectral_rolloff_mean'] = np.mean(desc['rolloff'])
+                features['spectral_rolloff_std'] = np.std(desc['rolloff'])
             
             # 9. Spectral flatness (how noise-like vs tonal)
-            spectral_flatness = librosa.feature.spectral_flatness(y=y, n_fft=self.n_fft, hop_length=self.hop_length)[0]
-            features['spectral_flatness_mean'] = np.mean(spectral_flatness)
-            features['spectral_flatness_std'] = np.std(spectral_flatness)
-            features['spectral_flatness_max'] = np.max(spectral_flatness)
+            if 'flatness' in desc:
+                spectral_flatness = desc['flatness']
+                features['spectral_flatness_mean'] = np.mean(spectral_flatness)
+                features['spectral_flatness_std'] = np.std(spectral_flatness)
+                features['spectral_flatness_max'] = np.max(spectral_flatness)
             
             # 10. Spectral contrast
-            spectral_contrast = librosa.feature.spectral_contrast(y=y, sr=sr, n_fft=self.n_fft, hop_length=self.hop_length)
-            features['spectral_contrast_mean'] = np.mean(spectral_contrast)
-            features['spectral_contrast_std'] = np.std(spectral_contrast)
+            if 'contrast' in desc:
+                features['spectral_contrast_mean'] = np.mean(desc['contrast'])
+                features['spectral_contrast_std'] = np.std(desc['contrast'])
             
         except Exception as e:
             logger.warning(f"Spectral artifact analysis failed: {e}")
         
         return features
 
-    def analyze_temporal_patterns(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_temporal_patterns(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                                  blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Analyze temporal patterns that differ between AI and human speech
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
             # 1. RMS energy over time
-            rms = librosa.feature.rms(y=y, frame_length=self.n_fft, hop_length=self.hop_length)[0]
-            features['rms_mean'] = np.mean(rms)
-            features['rms_std'] = np.std(rms)
-            features['rms_max'] = np.max(rms)
-            features['rms_min'] = np.min(rms)
-            features['rms_range'] = features['rms_max'] - features['rms_min']
-            
-            # Dynamic range (humans have more dynamic variation)
-            features['dynamic_range'] = 20 * np.log10((features['rms_max'] + 1e-10) / (features['rms_min'] + 1e-10))
+            if self._wants(blocks, 'rms'):
+                rms = ctx.rms()
+                features['rms_mean'] = np.mean(rms)
+                features['rms_std'] = np.std(rms)
+                features['rms_max'] = np.max(rms)
+                features['rms_min'] = np.min(rms)
+                features['rms_range'] = features['rms_max'] - features['rms_min']
+                
+                # Dynamic range (humans have more dynamic variation)
+                features['dynamic_range'] = 20 * np.log10((features['rms_max'] + 1e-10) / (features['rms_min'] + 1e-10))
             
             # 2. Zero crossing rate
-            zcr = librosa.feature.zero_crossing_rate(y, frame_length=self.n_fft, hop_length=self.hop_length)[0]
-            features['zcr_mean'] = np.mean(zcr)
-            features['zcr_std'] = np.std(zcr)
-            features['zcr_max'] = np.max(zcr)
+            if self._wants(blocks, 'zcr'):
+                zcr = librosa.feature.zero_crossing_rate(y, frame_length=self.n_fft, hop_length=self.hop_length)[0]
+                features['zcr_mean'] = np.mean(zcr)
+                features['zcr_std'] = np.std(zcr)
+                features['zcr_max'] = np.max(zcr)
+                
+                # ZCR range (humans have more variation)
+                features['zcr_range'] = np.max(zcr) - np.min(zcr)
             
             # 3. Autocorrelation analysis (periodicity)
-            autocorr = np.correlate(y, y, mode='same')
-            autocorr = autocorr[len(autocorr)//2:]  # Take positive lags only
-            autocorr = autocorr / autocorr[0]  # Normalize
-            
-            # Find peaks in autocorrelation (indicates periodicity)
-            if SCIPY_AVAILABLE:
-                peaks, _ = signal.find_peaks(autocorr, height=0.3, distance=100)
-                features['autocorr_num_peaks'] = len(peaks)
-                if len(peaks) > 1:
-                    features['autocorr_peak_regularity'] = np.std(np.diff(peaks))
-                else:
-                    features['autocorr_peak_regularity'] = 0
+            if self._wants(blocks, 'autocorr'):
+                # The positive lags np.correlate(y, y, mode='same') used to give, by FFT in O(n log n)
+                autocorr = autocorrelation(y, len(y) - len(y) // 2 - 1)
+                autocorr = autocorr / autocorr[0]  # Normalize
+                
+                # Find peaks in autocorrelation (indicates periodicity)
+                if SCIPY_AVAILABLE:
+                    peaks, _ = signal.find_peaks(autocorr, height=0.3, distance=100)
+                    features['autocorr_num_peaks'] = len(peaks)
+                    if len(peaks) > 1:
+                        features['autocorr_peak_regularity'] = np.std(np.diff(peaks))
+                    else:
+                        features['autocorr_peak_regularity'] = 0
+                
+                # Autocorrelation peak ratio (consistency of periodicity)
+                if len(autocorr) > 200:
+                    features['autocorr_peak_ratio'] = np.max(autocorr[50:200])
             
             # 4. Energy envelope analysis
             # Compute envelope using Hilbert transform
-            if SCIPY_AVAILABLE:
-                analytic_signal = signal.hilbert(y)
-                amplitude_envelope = np.abs(analytic_signal)
+            if self._wants(blocks, 'envelope'):
+                amplitude_envelope = ctx.envelope()
                 
                 # Envelope statistics
                 features['envelope_mean'] = np.mean(amplitude_envelope)
@@ -262,23 +511,13 @@ class AdvancedVoiceAnalyzer:
                 features['envelope_roughness'] = np.mean(np.abs(envelope_diff))
                 
                 # Envelope modulation rate
-                envelope_fft = np.abs(fft(amplitude_envelope - np.mean(amplitude_envelope)))[:len(amplitude_envelope)//2]
-                features['envelope_modulation_energy'] = np.sum(envelope_fft[:100])  # Low frequency modulation
-            
-            # 5. Silence/pause detection
-            # Count frames below threshold
-            silence_threshold = 0.01 * np.max(rms)
-            silent_frames = np.sum(rms < silence_threshold)
-            features['silence_ratio'] = silent_frames / len(rms)
-            
-            # 5.5 ZCR range (humans have more variation)
-            features['zcr_range'] = np.max(zcr) - np.min(zcr)
-            
-            # 5.6 RMS range
-            features['rms_range'] = np.max(rms) - np.min(rms)
-            
-            # 5.7 Envelope irregularity (frame-to-frame variation)
-            if 'amplitude_envelope' in dir():
+                # Only the first 100 DFT bins are used; removing the mean only changes the DC bin
+                envelope_fft = low_frequency_bins(amplitude_envelope, min(100, len(amplitude_envelope) // 2))
+                if len(envelope_fft):
+                    envelope_fft[0] -= len(amplitude_envelope) * features['envelope_mean']
+                features['envelope_modulation_energy'] = np.sum(np.abs(envelope_fft))  # Low frequency modulation
+                
+                # Envelope irregularity (frame-to-frame variation)
                 frame_size = 256
                 n_env_frames = len(amplitude_envelope) // frame_size
                 if n_env_frames > 2:
@@ -286,79 +525,91 @@ class AdvancedVoiceAnalyzer:
                     env_frame_energy = np.mean(env_frames, axis=1)
                     features['envelope_irregularity'] = np.std(np.diff(env_frame_energy))
             
-            # 5.8 Autocorrelation peak ratio (consistency of periodicity)
-            if 'autocorr' in dir() and len(autocorr) > 200:
-                main_peak = np.max(autocorr[50:200]) if len(autocorr) > 200 else 0
-                features['autocorr_peak_ratio'] = main_peak
+            # 5. Silence/pause detection
+            # Count frames below threshold
+            if self._wants(blocks, 'silence'):
+                rms = ctx.rms()
+                silence_threshold = 0.01 * np.max(rms)
+                silent_frames = np.sum(rms < silence_threshold)
+                features['silence_ratio'] = silent_frames / len(rms)
             
             # 6. Energy attack/decay patterns
             # Find energy onsets
-            onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=self.hop_length)
-            features['onset_strength_mean'] = np.mean(onset_env)
-            features['onset_strength_std'] = np.std(onset_env)
-            
-            onsets = librosa.onset.onset_detect(y=y, sr=sr, hop_length=self.hop_length, units='time')
-            features['num_onsets'] = len(onsets)
-            if len(onsets) > 1:
-                onset_intervals = np.diff(onsets)
-                features['onset_interval_mean'] = np.mean(onset_intervals)
-                features['onset_interval_std'] = np.std(onset_intervals)
+            if self._wants(blocks, 'onsets'):
+                onset_env = ctx.onset_envelope()
+                features['onset_strength_mean'] = np.mean(onset_env)
+                features['onset_strength_std'] = np.std(onset_env)
+                
+                onsets = ctx.onset_times()
+                features['num_onsets'] = len(onsets)
+                if len(onsets) > 1:
+                    onset_intervals = np.diff(onsets)
+                    features['onset_interval_mean'] = np.mean(onset_intervals)
+                    features['onset_interval_std'] = np.std(onset_intervals)
             
         except Exception as e:
             logger.warning(f"Temporal pattern analysis failed: {e}")
         
         return features
 
-    def analyze_mfcc_patterns(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_mfcc_patterns(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                              blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Deep MFCC analysis - key discriminator for AI voices
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
             # Compute MFCCs
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=self.n_mfcc, n_fft=self.n_fft, hop_length=self.hop_length)
+            mfcc = librosa.feature.mfcc(S=ctx.log_mel(), sr=sr, n_mfcc=self.n_mfcc)
             
             # 1. Basic MFCC statistics
-            for i in range(min(20, self.n_mfcc)):  # First 20 coefficients
-                features[f'mfcc_{i}_mean'] = np.mean(mfcc[i])
-                features[f'mfcc_{i}_std'] = np.std(mfcc[i])
+            if self._wants(blocks, 'coefficients'):
+                for i in range(min(20, self.n_mfcc)):  # First 20 coefficients
+                    features[f'mfcc_{i}_mean'] = np.mean(mfcc[i])
+                    features[f'mfcc_{i}_std'] = np.std(mfcc[i])
             
             # 2. Overall MFCC statistics
-            features['mfcc_overall_mean'] = np.mean(mfcc)
-            features['mfcc_overall_std'] = np.std(mfcc)
-            features['mfcc_overall_var'] = np.var(mfcc)
+            if self._wants(blocks, 'overall'):
+                features['mfcc_overall_mean'] = np.mean(mfcc)
+                features['mfcc_overall_std'] = np.std(mfcc)
+                features['mfcc_overall_var'] = np.var(mfcc)
             
             # 3. MFCC deltas (first derivative - temporal dynamics)
-            mfcc_delta = librosa.feature.delta(mfcc)
-            features['mfcc_delta_mean'] = np.mean(np.abs(mfcc_delta))
-            features['mfcc_delta_std'] = np.std(mfcc_delta)
-            features['mfcc_delta_max'] = np.max(np.abs(mfcc_delta))
+            if self._wants(blocks, 'delta'):
+                mfcc_delta = librosa.feature.delta(mfcc)
+                features['mfcc_delta_mean'] = np.mean(np.abs(mfcc_delta))
+                features['mfcc_delta_std'] = np.std(mfcc_delta)
+                features['mfcc_delta_max'] = np.max(np.abs(mfcc_delta))
             
             # 4. MFCC delta-deltas (second derivative - acceleration)
-            mfcc_delta2 = librosa.feature.delta(mfcc, order=2)
-            features['mfcc_delta2_mean'] = np.mean(np.abs(mfcc_delta2))
-            features['mfcc_delta2_std'] = np.std(mfcc_delta2)
+            if self._wants(blocks, 'delta2'):
+                mfcc_delta2 = librosa.feature.delta(mfcc, order=2)
+                features['mfcc_delta2_mean'] = np.mean(np.abs(mfcc_delta2))
+                features['mfcc_delta2_std'] = np.std(mfcc_delta2)
             
             # 5. MFCC correlation matrix analysis
             # AI voices often have different inter-coefficient correlations
-            mfcc_corr = np.corrcoef(mfcc)
-            features['mfcc_corr_mean'] = np.mean(mfcc_corr)
-            features['mfcc_corr_std'] = np.std(mfcc_corr)
-            
-            # Off-diagonal correlations
-            off_diag = mfcc_corr[np.triu_indices(len(mfcc_corr), k=1)]
-            features['mfcc_corr_offdiag_mean'] = np.mean(off_diag)
-            features['mfcc_corr_offdiag_std'] = np.std(off_diag)
+            if self._wants(blocks, 'correlation'):
+                mfcc_corr = np.corrcoef(mfcc)
+                features['mfcc_corr_mean'] = np.mean(mfcc_corr)
+                features['mfcc_corr_std'] = np.std(mfcc_corr)
+                
+                # Off-diagonal correlations
+                off_diag = mfcc_corr[np.triu_indices(len(mfcc_corr), k=1)]
+                features['mfcc_corr_offdiag_mean'] = np.mean(off_diag)
+                features['mfcc_corr_offdiag_std'] = np.std(off_diag)
             
             # 6. Temporal consistency of MFCCs
             # How much do MFCCs change frame to frame
-            mfcc_frame_diff = np.diff(mfcc, axis=1)
-            features['mfcc_temporal_diff_mean'] = np.mean(np.abs(mfcc_frame_diff))
-            features['mfcc_temporal_diff_std'] = np.std(mfcc_frame_diff)
+            if self._wants(blocks, 'temporal_diff'):
+                mfcc_frame_diff = np.diff(mfcc, axis=1)
+                features['mfcc_temporal_diff_mean'] = np.mean(np.abs(mfcc_frame_diff))
+                features['mfcc_temporal_diff_std'] = np.std(mfcc_frame_diff)
             
             # 7. MFCC skewness and kurtosis
-            if SCIPY_AVAILABLE:
+            if SCIPY_AVAILABLE and self._wants(blocks, 'moments'):
                 features['mfcc_skewness'] = np.mean([stats.skew(mfcc[i]) for i in range(mfcc.shape[0])])
                 features['mfcc_kurtosis'] = np.mean([stats.kurtosis(mfcc[i]) for i in range(mfcc.shape[0])])
             
@@ -367,67 +618,60 @@ class AdvancedVoiceAnalyzer:
         
         return features
 
-    def analyze_pitch_and_prosody(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_pitch_and_prosody(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                                  blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Analyze pitch and prosody patterns
         AI voices often have unnatural pitch patterns
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
-            # 1. Pitch tracking using piptrack
-            pitches, magnitudes = librosa.piptrack(y=y, sr=sr, n_fft=self.n_fft, hop_length=self.hop_length)
-            
-            # Extract pitch values (take max magnitude pitch per frame)
-            pitch_values = []
-            for t in range(pitches.shape[1]):
-                index = magnitudes[:, t].argmax()
-                pitch = pitches[index, t]
-                if pitch > 50 and pitch < 500:  # Reasonable voice pitch range
-                    pitch_values.append(pitch)
-            
-            if len(pitch_values) > 10:
-                pitch_values = np.array(pitch_values)
+            # 1. Pitch tracking (max magnitude pitch per frame, voice range only)
+            if self._wants(blocks, 'pitch'):
+                pitch_values = ctx.voiced_pitch()
                 
-                features['pitch_mean'] = np.mean(pitch_values)
-                features['pitch_std'] = np.std(pitch_values)
-                features['pitch_median'] = np.median(pitch_values)
-                features['pitch_range'] = np.max(pitch_values) - np.min(pitch_values)
-                features['pitch_iqr'] = np.percentile(pitch_values, 75) - np.percentile(pitch_values, 25)
-                
-                # Pitch coefficient of variation (normalized variability)
-                features['pitch_cv'] = features['pitch_std'] / (features['pitch_mean'] + 1e-10)
-                
-                # Pitch contour smoothness
-                pitch_diff = np.diff(pitch_values)
-                features['pitch_diff_mean'] = np.mean(np.abs(pitch_diff))
-                features['pitch_diff_std'] = np.std(pitch_diff)
-                features['pitch_diff_max'] = np.max(np.abs(pitch_diff))
-                
-                # Pitch jitter (rapid pitch variations) - important for naturalness
-                jitter = np.mean(np.abs(np.diff(pitch_values))) / (features['pitch_mean'] + 1e-10)
-                features['pitch_jitter'] = jitter
-                
-                # Pitch skewness and kurtosis
-                if SCIPY_AVAILABLE:
-                    features['pitch_skewness'] = stats.skew(pitch_values)
-                    features['pitch_kurtosis'] = stats.kurtosis(pitch_values)
+                if len(pitch_values) > 10:
+                    features['pitch_mean'] = np.mean(pitch_values)
+                    features['pitch_std'] = np.std(pitch_values)
+                    features['pitch_median'] = np.median(pitch_values)
+                    features['pitch_range'] = np.max(pitch_values) - np.min(pitch_values)
+                    features['pitch_iqr'] = np.percentile(pitch_values, 75) - np.percentile(pitch_values, 25)
+                    
+                    # Pitch coefficient of variation (normalized variability)
+                    features['pitch_cv'] = features['pitch_std'] / (features['pitch_mean'] + 1e-10)
+                    
+                    # Pitch contour smoothness
+                    pitch_diff = np.diff(pitch_values)
+                    features['pitch_diff_mean'] = np.mean(np.abs(pitch_diff))
+                    features['pitch_diff_std'] = np.std(pitch_diff)
+                    features['pitch_diff_max'] = np.max(np.abs(pitch_diff))
+                    
+                    # Pitch jitter (rapid pitch variations) - important for naturalness
+                    jitter = np.mean(np.abs(np.diff(pitch_values))) / (features['pitch_mean'] + 1e-10)
+                    features['pitch_jitter'] = jitter
+                    
+                    # Pitch skewness and kurtosis
+                    if SCIPY_AVAILABLE:
+                        features['pitch_skewness'] = stats.skew(pitch_values)
+                        features['pitch_kurtosis'] = stats.kurtosis(pitch_values)
             
             # 2. Harmonic analysis
-            harmonic, percussive = librosa.effects.hpss(y)
-            
-            features['harmonic_mean'] = np.mean(np.abs(harmonic))
-            features['harmonic_std'] = np.std(harmonic)
-            features['percussive_mean'] = np.mean(np.abs(percussive))
-            features['percussive_std'] = np.std(percussive)
-            features['harmonic_percussive_ratio'] = features['harmonic_mean'] / (features['percussive_mean'] + 1e-10)
+            if self._wants(blocks, 'harmonic'):
+                harmonic, percussive = ctx.harmonic(), ctx.percussive()
+                
+                features['harmonic_mean'] = np.mean(np.abs(harmonic))
+                features['harmonic_std'] = np.std(harmonic)
+                features['percussive_mean'] = np.mean(np.abs(percussive))
+                features['percussive_std'] = np.std(percussive)
+                features['harmonic_percussive_ratio'] = features['harmonic_mean'] / (features['percussive_mean'] + 1e-10)
             
             # 3. Formant-like analysis using LPC
             # Get spectral peaks that might correspond to formants
-            S = np.abs(librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length))
-            S_mean = np.mean(S, axis=1)
-            
-            if SCIPY_AVAILABLE:
+            if SCIPY_AVAILABLE and self._wants(blocks, 'spectral_peaks'):
+                S = ctx.magnitude()
+                S_mean = np.mean(S, axis=1)
                 peaks, properties = signal.find_peaks(S_mean, height=np.max(S_mean) * 0.1, distance=10)
                 features['num_spectral_peaks'] = len(peaks)
                 if len(peaks) > 1:
@@ -439,101 +683,111 @@ class AdvancedVoiceAnalyzer:
         
         return features
 
-    def analyze_phase_patterns(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_phase_patterns(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                               blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Analyze phase information - AI vocoders often have phase artifacts
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
-            # Compute STFT with phase
-            D = librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length)
-            magnitude = np.abs(D)
-            phase = np.angle(D)
+            # Phase of the shared STFT
+            phase = np.angle(ctx.stft())
             
             # 1. Phase derivative (instantaneous frequency deviation)
-            phase_diff = np.diff(phase, axis=1)
-            # Unwrap phase differences
-            phase_diff = np.mod(phase_diff + np.pi, 2 * np.pi) - np.pi
-            
-            features['phase_diff_mean'] = np.mean(np.abs(phase_diff))
-            features['phase_diff_std'] = np.std(phase_diff)
+            if self._wants(blocks, 'phase_diff'):
+                phase_diff = np.diff(phase, axis=1)
+                # Unwrap phase differences
+                phase_diff = np.mod(phase_diff + np.pi, 2 * np.pi) - np.pi
+                
+                features['phase_diff_mean'] = np.mean(np.abs(phase_diff))
+                features['phase_diff_std'] = np.std(phase_diff)
+                
+                # Overall phase coherence (AI tends to be more coherent)
+                features['phase_coherence'] = np.mean(np.abs(np.cos(phase_diff)))
             
             # 2. Group delay deviation
             # In natural speech, group delay varies; AI might be more regular
-            group_delay = -np.diff(phase, axis=0) / (2 * np.pi * self.hop_length / sr)
-            features['group_delay_std'] = np.std(group_delay)
+            if self._wants(blocks, 'group_delay'):
+                group_delay = -np.diff(phase, axis=0) / (2 * np.pi * self.hop_length / sr)
+                features['group_delay_std'] = np.std(group_delay)
             
             # 3. Phase coherence across frequency bands
             # AI vocoders might have unusual phase relationships
-            n_bands = 4
-            band_size = phase.shape[0] // n_bands
-            band_coherences = []
-            for i in range(n_bands - 1):
-                band1 = phase[i * band_size:(i + 1) * band_size, :]
-                band2 = phase[(i + 1) * band_size:(i + 2) * band_size, :]
-                # Compute phase coherence
-                coherence = np.mean(np.cos(band1[:min(band1.shape[0], band2.shape[0])] - 
-                                          band2[:min(band1.shape[0], band2.shape[0])]))
-                band_coherences.append(coherence)
-            
-            features['phase_band_coherence_mean'] = np.mean(band_coherences)
-            features['phase_band_coherence_std'] = np.std(band_coherences)
-            
-            # 3.5 Overall phase coherence (AI tends to be more coherent)
-            features['phase_coherence'] = np.mean(np.abs(np.cos(phase_diff)))
+            if self._wants(blocks, 'band_coherence'):
+                n_bands = 4
+                band_size = phase.shape[0] // n_bands
+                band_coherences = []
+                for i in range(n_bands - 1):
+                    band1 = phase[i * band_size:(i + 1) * band_size, :]
+                    band2 = phase[(i + 1) * band_size:(i + 2) * band_size, :]
+                    # Compute phase coherence
+                    coherence = np.mean(np.cos(band1[:min(band1.shape[0], band2.shape[0])] - 
+                                              band2[:min(band1.shape[0], band2.shape[0])]))
+                    band_coherences.append(coherence)
+                
+                features['phase_band_coherence_mean'] = np.mean(band_coherences)
+                features['phase_band_coherence_std'] = np.std(band_coherences)
             
             # 4. Magnitude-phase relationship
             # Natural speech has specific magnitude-phase relationships
-            mag_phase_corr = np.corrcoef(magnitude.flatten()[:10000], 
-                                         np.abs(phase).flatten()[:10000])[0, 1]
-            features['mag_phase_correlation'] = mag_phase_corr if not np.isnan(mag_phase_corr) else 0
+            if self._wants(blocks, 'mag_phase'):
+                magnitude = ctx.magnitude()
+                mag_phase_corr = np.corrcoef(magnitude.flatten()[:10000], 
+                                             np.abs(phase).flatten()[:10000])[0, 1]
+                features['mag_phase_correlation'] = mag_phase_corr if not np.isnan(mag_phase_corr) else 0
             
         except Exception as e:
             logger.warning(f"Phase analysis failed: {e}")
         
         return features
 
-    def analyze_noise_patterns(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_noise_patterns(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                               blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Analyze noise characteristics
         AI voices often have different noise profiles
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
-            # 1. Estimate noise floor
-            S = np.abs(librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length))
+            S = ctx.magnitude()
             
+            # 1. Estimate noise floor
             # Use minimum statistics for noise floor estimation
-            S_min = np.percentile(S, 5, axis=1)
-            S_mean = np.mean(S, axis=1)
-            
-            features['noise_floor_mean'] = np.mean(S_min)
-            features['noise_floor_std'] = np.std(S_min)
-            features['snr_estimate'] = np.mean(S_mean) / (np.mean(S_min) + 1e-10)
+            if self._wants(blocks, 'noise_floor'):
+                S_min = np.percentile(S, 5, axis=1)
+                S_mean = np.mean(S, axis=1)
+                
+                features['noise_floor_mean'] = np.mean(S_min)
+                features['noise_floor_std'] = np.std(S_min)
+                features['snr_estimate'] = np.mean(S_mean) / (np.mean(S_min) + 1e-10)
             
             # 2. Spectral noise-like regions
-            flatness = librosa.feature.spectral_flatness(y=y, n_fft=self.n_fft, hop_length=self.hop_length)[0]
-            
-            # High flatness indicates noise-like content
-            noise_frames = np.sum(flatness > 0.5) / len(flatness)
-            features['noise_frame_ratio'] = noise_frames
+            if self._wants(blocks, 'noise_frames'):
+                flatness = librosa.feature.spectral_flatness(S=S, n_fft=self.n_fft, hop_length=self.hop_length)[0]
+                
+                # High flatness indicates noise-like content
+                noise_frames = np.sum(flatness > 0.5) / len(flatness)
+                features['noise_frame_ratio'] = noise_frames
             
             # 3. Residual analysis after harmonic removal
-            harmonic = librosa.effects.harmonic(y)
-            residual = y - harmonic
-            
-            features['residual_energy'] = np.mean(residual ** 2)
-            features['residual_ratio'] = features['residual_energy'] / (np.mean(y ** 2) + 1e-10)
-            features['residual_variance'] = np.var(residual)
+            if self._wants(blocks, 'residual'):
+                harmonic = ctx.harmonic()
+                residual = y - harmonic
+                
+                features['residual_energy'] = np.mean(residual ** 2)
+                features['residual_ratio'] = features['residual_energy'] / (np.mean(y ** 2) + 1e-10)
+                features['residual_variance'] = np.var(residual)
             
             # 4. High frequency noise analysis
             # AI often has cleaner or different HF noise
             nyquist = sr // 2
             hf_cutoff = int(0.7 * nyquist)
             
-            if SCIPY_AVAILABLE:
+            if SCIPY_AVAILABLE and self._wants(blocks, 'hf_noise'):
                 # High-pass filter
                 sos = signal.butter(5, hf_cutoff, btype='high', fs=sr, output='sos')
                 y_hf = signal.sosfilt(sos, y)
@@ -545,92 +799,91 @@ class AdvancedVoiceAnalyzer:
         
         return features
 
-    def analyze_statistical_moments(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_statistical_moments(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                                    blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Compute statistical moments of the waveform
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
             # 1. Basic moments
-            features['signal_mean'] = np.mean(y)
-            features['signal_std'] = np.std(y)
-            features['signal_var'] = np.var(y)
-            
-            if SCIPY_AVAILABLE:
-                features['signal_skewness'] = stats.skew(y)
-                features['signal_kurtosis'] = stats.kurtosis(y)
+            if self._wants(blocks, 'moments'):
+                moments = ctx.moments()
+                features['signal_mean'] = moments.mean
+                features['signal_std'] = moments.std
+                features['signal_var'] = moments.var
+                features['signal_skewness'] = moments.skewness
+                features['signal_kurtosis'] = moments.kurtosis
             
             # 2. Peak statistics
-            features['signal_max'] = np.max(np.abs(y))
-            features['signal_peak_count'] = len(signal.find_peaks(y, height=0.5 * np.max(y))[0]) if SCIPY_AVAILABLE else 0
-            
-            # Crest factor (peak to RMS ratio)
-            rms = np.sqrt(np.mean(y ** 2))
-            features['crest_factor'] = features['signal_max'] / (rms + 1e-10)
+            if self._wants(blocks, 'peaks'):
+                moments = ctx.moments()
+                features['signal_max'] = moments.peak
+                features['signal_peak_count'] = len(signal.find_peaks(y, height=0.5 * moments.maximum)[0]) if SCIPY_AVAILABLE else 0
+                
+                # Crest factor (peak to RMS ratio)
+                rms = np.sqrt(moments.mean_square)
+                features['crest_factor'] = features['signal_max'] / (rms + 1e-10)
             
             # 3. Distribution analysis
-            # Histogram-based features
-            hist, bin_edges = np.histogram(y, bins=100, density=True)
-            features['hist_entropy'] = -np.sum(hist[hist > 0] * np.log2(hist[hist > 0] + 1e-10))
-            features['hist_peak'] = np.max(hist)
-            features['hist_peak_position'] = bin_edges[np.argmax(hist)]
+            # Histogram-based features (the range is the known min/max, so no extra scan)
+            if self._wants(blocks, 'histogram'):
+                moments = ctx.moments()
+                hist, bin_edges = np.histogram(y, bins=100, range=(moments.minimum, moments.maximum), density=True)
+                features['hist_entropy'] = -np.sum(hist[hist > 0] * np.log2(hist[hist > 0] + 1e-10))
+                features['hist_peak'] = np.max(hist)
+                features['hist_peak_position'] = bin_edges[np.argmax(hist)]
             
             # 4. Percentiles
-            features['signal_p10'] = np.percentile(np.abs(y), 10)
-            features['signal_p90'] = np.percentile(np.abs(y), 90)
-            features['signal_p99'] = np.percentile(np.abs(y), 99)
-            features['signal_iqr'] = np.percentile(np.abs(y), 75) - np.percentile(np.abs(y), 25)
+            if self._wants(blocks, 'percentiles'):
+                # One |y| and one partition for all five percentiles
+                p10, p25, p75, p90, p99 = np.percentile(np.abs(y), [10, 25, 75, 90, 99])
+                features['signal_p10'] = p10
+                features['signal_p90'] = p90
+                features['signal_p99'] = p99
+                features['signal_iqr'] = p75 - p25
             
         except Exception as e:
             logger.warning(f"Statistical analysis failed: {e}")
         
         return features
 
-    def analyze_micro_modulations(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_micro_modulations(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                                  blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Analyze micro-modulations that distinguish human from AI voices
         Human voices have natural micro-variations that AI often lacks
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
-            # 1. Shimmer analysis (amplitude perturbation)
-            # Extract short-term amplitude variations
             frame_length = int(0.025 * sr)  # 25ms frames
             hop_length = int(0.010 * sr)    # 10ms hop
-            
             n_frames = (len(y) - frame_length) // hop_length + 1
-            amplitudes = []
-            for i in range(n_frames):
-                start = i * hop_length
-                end = start + frame_length
-                frame = y[start:end]
-                amplitudes.append(np.max(np.abs(frame)))
             
-            if len(amplitudes) > 10:
-                amplitudes = np.array(amplitudes)
-                # Shimmer: average difference between consecutive amplitudes
-                amp_diff = np.abs(np.diff(amplitudes))
-                features['shimmer'] = np.mean(amp_diff) / (np.mean(amplitudes) + 1e-10)
-                features['shimmer_db'] = 20 * np.log10(1 + features['shimmer'])
+            # 1. Shimmer analysis (amplitude perturbation)
+            # Extract short-term amplitude variations
+            if self._wants(blocks, 'shimmer'):
+                amplitudes = frame_max_abs(y, frame_length, hop_length)
                 
-                # Amplitude perturbation quotient
-                features['apq'] = np.std(amplitudes) / (np.mean(amplitudes) + 1e-10)
+                if len(amplitudes) > 10:
+                    # Shimmer: average difference between consecutive amplitudes
+                    amp_diff = np.abs(np.diff(amplitudes))
+                    features['shimmer'] = np.mean(amp_diff) / (np.mean(amplitudes) + 1e-10)
+                    features['shimmer_db'] = 20 * np.log10(1 + features['shimmer'])
+                    
+                    # Amplitude perturbation quotient
+                    features['apq'] = np.std(amplitudes) / (np.mean(amplitudes) + 1e-10)
             
             # 2. Micro-pitch variations (not just jitter, but subtle fluctuations)
-            if LIBROSA_AVAILABLE:
+            if LIBROSA_AVAILABLE and self._wants(blocks, 'micro_pitch'):
                 # Use short-time pitch tracking
-                pitches, magnitudes = librosa.piptrack(y=y, sr=sr, n_fft=512, hop_length=128)
-                pitch_track = []
-                for t in range(pitches.shape[1]):
-                    idx = magnitudes[:, t].argmax()
-                    p = pitches[idx, t]
-                    if 50 < p < 500:
-                        pitch_track.append(p)
+                pitch_track = ctx.voiced_pitch(512, 128)
                 
                 if len(pitch_track) > 20:
-                    pitch_track = np.array(pitch_track)
                     # Compute pitch perturbation quotient
                     pitch_diff = np.abs(np.diff(pitch_track))
                     features['ppq'] = np.mean(pitch_diff) / (np.mean(pitch_track) + 1e-10)
@@ -642,38 +895,26 @@ class AdvancedVoiceAnalyzer:
             
             # 3. Spectral micro-variations
             # Analyze frame-to-frame spectral changes at fine time resolution
-            D = np.abs(librosa.stft(y, n_fft=512, hop_length=128))
-            spectral_diff = np.diff(D, axis=1)
-            
-            # Micro spectral flux
-            features['micro_spectral_flux'] = np.mean(np.sqrt(np.sum(spectral_diff**2, axis=0)))
-            features['micro_spectral_flux_std'] = np.std(np.sqrt(np.sum(spectral_diff**2, axis=0)))
+            if self._wants(blocks, 'micro_flux'):
+                D = ctx.magnitude(512, 128)
+                spectral_diff = np.diff(D, axis=1)
+                
+                # Micro spectral flux
+                features['micro_spectral_flux'] = np.mean(np.sqrt(np.sum(spectral_diff**2, axis=0)))
+                features['micro_spectral_flux_std'] = np.std(np.sqrt(np.sum(spectral_diff**2, axis=0)))
             
             # 4. Formant-like analysis using LPC-based approach
             # Human formants have natural variations; AI may be too consistent
-            if SCIPY_AVAILABLE:
-                # Use simple spectral peak analysis as formant proxy
-                n_formant_frames = min(50, n_frames)
-                formant_positions = []
-                
-                for i in range(0, len(y) - frame_length, len(y) // n_formant_frames):
-                    frame = y[i:i + frame_length]
-                    if len(frame) < frame_length:
-                        continue
-                    
-                    # Compute spectrum
-                    spectrum = np.abs(fft(frame * np.hanning(len(frame))))[:len(frame)//2]
-                    freqs = np.fft.fftfreq(len(frame), 1/sr)[:len(frame)//2]
-                    
-                    # Find peaks (formant candidates)
-                    peaks, _ = signal.find_peaks(spectrum, height=np.max(spectrum) * 0.1, distance=10)
-                    if len(peaks) >= 2:
-                        # Take first two major peaks as F1, F2 proxies
-                        sorted_peaks = peaks[np.argsort(spectrum[peaks])[::-1]][:2]
-                        formant_positions.append([freqs[sorted_peaks[0]], freqs[sorted_peaks[1]]])
+            if SCIPY_AVAILABLE and self._wants(blocks, 'formants'):
+                # Use simple spectral peak analysis as formant proxy: the two strongest
+                # peaks of frames spread evenly over the clip, all in one batch
+                n_formant_frames = min(self.formant_frames, n_frames)
+                # y[:-1]: the last frame starts strictly before len(y) - frame_length
+                frames = frame(y[:-1], frame_length, len(y) // n_formant_frames)
+                formant_positions, has_two = formant_peaks(frames, sr)
+                formant_positions = formant_positions[has_two]
                 
                 if len(formant_positions) > 5:
-                    formant_positions = np.array(formant_positions)
                     features['formant_f1_var'] = np.var(formant_positions[:, 0])
                     features['formant_f2_var'] = np.var(formant_positions[:, 1])
                     features['formant_trajectory_var'] = np.var(np.diff(formant_positions, axis=0))
@@ -683,72 +924,78 @@ class AdvancedVoiceAnalyzer:
         
         return features
 
-    def analyze_breath_patterns(self, y: np.ndarray, sr: int) -> Dict[str, float]:
+    def analyze_breath_patterns(self, y: np.ndarray, sr: int, ctx: Optional[AnalysisContext] = None,
+                                blocks: Optional[set] = None) -> Dict[str, float]:
         """
         Analyze breath and pause patterns
         Human speech has natural breathing patterns that AI often lacks
         """
         features = {}
+        ctx = ctx or self.create_context(y, sr)
         
         try:
-            # Compute RMS energy with small window for fine detail
-            frame_length = int(0.02 * sr)  # 20ms
-            hop_length = int(0.005 * sr)   # 5ms hop
-            
-            if LIBROSA_AVAILABLE:
-                rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
-            else:
-                n_frames = (len(y) - frame_length) // hop_length + 1
-                rms = np.array([np.sqrt(np.mean(y[i*hop_length:i*hop_length+frame_length]**2)) 
-                               for i in range(n_frames)])
-            
-            # Normalize RMS
-            rms_norm = rms / (np.max(rms) + 1e-10)
-            
-            # Find quiet regions (potential breath/pause regions)
-            quiet_threshold = 0.1
-            quiet_mask = rms_norm < quiet_threshold
-            
-            # Count transitions into and out of quiet regions
-            transitions = np.diff(quiet_mask.astype(int))
-            n_pauses = np.sum(transitions == 1)  # Entries into quiet
-            
-            # Pause statistics
-            features['pause_count'] = n_pauses
-            features['pause_rate'] = n_pauses / (len(y) / sr)  # Pauses per second
-            
-            # Analyze quiet region characteristics (potential breath sounds)
-            if np.sum(quiet_mask) > 0:
-                quiet_regions = rms_norm[quiet_mask]
-                features['quiet_energy_mean'] = np.mean(quiet_regions)
-                features['quiet_energy_var'] = np.var(quiet_regions)
+            # 1. Pause and quiet-region analysis
+            if self._wants(blocks, 'pauses'):
+                # Compute RMS energy with small window for fine detail
+                frame_length = int(0.02 * sr)  # 20ms
+                hop_length = int(0.005 * sr)   # 5ms hop
                 
-                # In human speech, quiet regions aren't completely silent (breath sounds)
-                # AI tends to have very clean silences
-                features['breath_indicator'] = np.mean(quiet_regions > 0.02)
-            else:
-                features['quiet_energy_mean'] = 0
-                features['quiet_energy_var'] = 0
-                features['breath_indicator'] = 0
-            
-            # Analyze pause durations
-            if n_pauses > 0:
-                # Find pause start and end indices
-                pause_starts = np.where(transitions == 1)[0]
-                pause_ends = np.where(transitions == -1)[0]
+                if LIBROSA_AVAILABLE:
+                    rms = ctx.rms(frame_length, hop_length)
+                else:
+                    rms = frame_rms(y, frame_length, hop_length)
+                
+                # Normalize RMS
+                rms_norm = rms / (np.max(rms) + 1e-10)
+                
+                # Find quiet regions (potential breath/pause regions)
+                quiet_threshold = 0.1
+                quiet_mask = rms_norm < quiet_threshold
+                
+                # Count transitions into and out of quiet regions
+                transitions = np.diff(quiet_mask.astype(int))
+                n_pauses = np.sum(transitions == 1)  # Entries into quiet
+                
+                # Pause statistics
+                features['pause_count'] = n_pauses
+                features['pause_rate'] = n_pauses / (len(y) / sr)  # Pauses per second
+                
+                # Analyze quiet region characteristics (potential breath sounds)
+                if np.sum(quiet_mask) > 0:
+                    quiet_regions = rms_norm[quiet_mask]
+                    features['quiet_energy_mean'] = np.mean(quiet_regions)
+                    features['quiet_energy_var'] = np.var(quiet_regions)
+                    
+                    # In human speech, quiet regions aren't completely silent (breath sounds)
+                    # AI tends to have very clean silences
+                    features['breath_indicator'] = np.mean(quiet_regions > 0.02)
+                else:
+                    features['quiet_energy_mean'] = 0
+                    features['quiet_energy_var'] = 0
+                    features['breath_indicator'] = 0
                 
-                # Handle edge cases
-                if len(pause_ends) > 0 and len(pause_starts) > 0:
-                    if pause_ends[0] < pause_starts[0]:
-                        pause_ends = pause_ends[1:]
-                    if len(pause_starts) > len(pause_ends):
-                        pause_starts = pause_starts[:len(pause_ends)]
+                # Analyze pause durations
+                if n_pauses > 0:
+                    # Find pause start and end indices
+                    pause_starts = np.where(transitions == 1)[0]
+                    pause_ends = np.where(transitions == -1)[0]
                     
-                    if len(pause_starts) > 0 and len(pause_ends) > 0:
-                        pause_durations = (pause_ends - pause_starts) * (hop_length / sr)
-                        features['pause_duration_mean'] = np.mean(pause_durations)
-                        features['pause_duration_var'] = np.var(pause_durations)
-                        features['pause_duration_cv'] = np.std(pause_durations) / (np.mean(pause_durations) + 1e-10)
+                    # Handle edge cases
+                    if len(pause_ends) > 0 and len(pause_starts) > 0:
+                        if pause_ends[0] < pause_starts[0]:
+                            pause_ends = pause_ends[1:]
+                        if len(pause_starts) > len(pause_ends):
+                            pause_starts = pause_starts[:len(pause_ends)]
+                        
+                        if len(pause_starts) > 0 and len(pause_ends) > 0:
+                            pause_durations = (pause_ends - pause_starts) * (hop_length / sr)
+                            features['pause_duration_mean'] = np.mean(pause_durations)
+                            features['pause_duration_var'] = np.var(pause_durations)
+                            features['pause_duration_cv'] = np.std(pause_durations) / (np.mean(pause_durations) + 1e-10)
+                        else:
+                            features['pause_duration_mean'] = 0
+                            features['pause_duration_var'] = 0
+                            features['pause_duration_cv'] = 0
                     else:
                         features['pause_duration_mean'] = 0
                         features['pause_duration_var'] = 0
@@ -757,21 +1004,17 @@ class AdvancedVoiceAnalyzer:
                     features['pause_duration_mean'] = 0
                     features['pause_duration_var'] = 0
                     features['pause_duration_cv'] = 0
-            else:
-                features['pause_duration_mean'] = 0
-                features['pause_duration_var'] = 0
-                features['pause_duration_cv'] = 0
             
-            # Onset detection: how does energy ramp up after pauses?
+            # 2. Onset detection: how does energy ramp up after pauses?
             # Human voice has more natural onsets, AI can be more abrupt
-            if LIBROSA_AVAILABLE and len(y) > sr * 0.1:
-                onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+            if LIBROSA_AVAILABLE and len(y) > sr * 0.1 and self._wants(blocks, 'onsets'):
+                onset_env = ctx.onset_envelope()
                 features['onset_strength_mean'] = np.mean(onset_env)
                 features['onset_strength_var'] = np.var(onset_env)
                 features['onset_strength_max'] = np.max(onset_env)
                 
                 # Onset regularity (AI often has more regular onsets)
-                onsets = librosa.onset.onset_detect(y=y, sr=sr, units='time')
+                onsets = ctx.onset_times()
                 if len(onsets) > 2:
                     onset_intervals = np.diff(onsets)
                     features['onset_interval_cv'] = np.std(onset_intervals) / (np.mean(onset_intervals) + 1e-10)
@@ -889,120 +1132,231 @@ class EnsembleClassifier:
             'hist_entropy': {'threshold': 4, 'direction': 'below', 'weight': 1.3, 'ai_indicator': True},
             'signal_iqr': {'threshold': 0.1, 'direction': 'below', 'weight': 1.0, 'ai_indicator': True},
         }
+        
+        self.compile()
+    
+    def compile(self):
+        """
+        Compile self.thresholds into aligned arrays for vectorized scoring
+        Call again after editing thresholds in place
+        """
+        configs = list(self.thresholds.values())
+        self.feature_names = list(self.thresholds.keys())
+        self._threshold = np.array([c['threshold'] for c in configs], dtype=np.float64)
+        self._below = np.array([c['direction'] == 'below' for c in configs], dtype=bool)
+        self._weight = np.array([c['weight'] for c in configs], dtype=np.float64)
+        self._ai_indicator = np.array([c['ai_indicator'] for c in configs], dtype=bool)
     
-    def classify(self, features: Dict[str, float]) -> Tuple[str, float, Dict]:
+    def version(self) -> str:
+        """Short digest of the thresholds; changes whenever the rules do"""
+        return hashlib.md5(repr(sorted(self.thresholds.items())).encode()).hexdigest()[:12]
+    
+    def feature_matrix(self, feature_dicts: List[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Align feature dicts to an N x F matrix in self.feature_names order
+        Returns the matrix (NaN where missing) and a boolean presence mask
+        """
+        X = np.full((len(feature_dicts), len(self.feature_names)), np.nan)
+        present = np.zeros(X.shape, dtype=bool)
+        for row, features in enumerate(feature_dicts):
+            for col, name in enumerate(self.feature_names):
+                if name in features:
+                    X[row, col] = features[name]
+                    present[row, col] = True
+        return X, present
+    
+    def score_matrix(self, X: np.ndarray, present: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Score N clips at once from an N x F feature matrix
+        Columns follow self.feature_names; present defaults to ~isnan(X).
+        Returns per-clip classification, confidence and vote counts plus the
+        per-feature distance/weight/vote matrices used to build vote details
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if present is None:
+            present = ~np.isnan(X)
+        
+        threshold = self._threshold
+        nonzero = threshold != 0
+        scale = np.where(nonzero, np.abs(threshold), 1.0)
+        with np.errstate(invalid='ignore'):
+            # Normalized distance from threshold (zero thresholds use the raw value)
+            below_distance = np.where(nonzero, (threshold - X) / scale, np.where(X > 0, -X, 1.0))
+            above_distance = np.where(nonzero, (X - threshold) / scale, np.where(X > 0, X, -1.0))
+            distance = np.where(self._below, below_distance, above_distance)
+            indicates_ai = np.where(self._below, X < threshold, X > threshold)
+        
+        # Apply indicator logic
+        indicates_ai = indicates_ai ^ ~self._ai_indicator
+        distance = np.where(self._ai_indicator, distance, -distance)
+        
+        # Soft voting: stronger votes when far from threshold
+        confidence_factor = np.clip(1.0 + np.tanh(distance * 0.5), 0.1, 2.0)
+        confidence_factor = np.where(np.isnan(confidence_factor), 0.1, confidence_factor)
+        effective_weight = self._weight * confidence_factor
+        
+        ai_votes_mask = present & indicates_ai
+        human_votes_mask = present & ~indicates_ai
+        ai_score = np.sum(np.where(ai_votes_mask, effective_weight, 0.0), axis=1)
+        total_weight = np.sum(np.where(present, effective_weight, 0.0), axis=1)
+        ai_votes = ai_votes_mask.sum(axis=1)
+        human_votes = human_votes_mask.sum(axis=1)
+        matched = present.sum(axis=1)
+        
+        # Weighted probability combined with raw vote ratio for balanced decision
+        ai_probability = np.divide(ai_score, total_weight, out=np.full_like(ai_score, 0.5), where=total_weight > 0)
+        vote_total = np.maximum(1, ai_votes + human_votes)
+        raw_ai_ratio = ai_votes / vote_total
+        combined_ai_prob = 0.6 * ai_probability + 0.4 * raw_ai_ratio
+        
+        # Map [0.50, 1.0] -> [0.52, 0.98] for AI and [0.0, 0.50] -> [0.98, 0.52] for HUMAN
+        decision_threshold = 0.50
+        is_ai = combined_ai_prob >= decision_threshold
+        confidence = np.where(
+            is_ai,
+            0.52 + (combined_ai_prob - decision_threshold) * (0.98 - 0.52) / (1.0 - decision_threshold),
+            0.98 - (combined_ai_prob / decision_threshold) * (0.98 - 0.52)
+        )
+        confidence = np.clip(confidence, 0.52, 0.98)
+        
+        # Boost confidence if vote is very one-sided
+        vote_ratio = np.maximum(ai_votes, human_votes) / vote_total
+        confidence = np.where(vote_ratio > 0.75, np.minimum(0.98, confidence * 1.05), confidence)
+        
+        # Require minimum features for reliable classification
+        reliable = matched >= 5
+        classification = np.where(is_ai & reliable, "AI_GENERATED", "HUMAN")
+        confidence = np.where(reliable, confidence, 0.55)
+        
+        return {
+            'classification': classification,
+            'confidence': np.round(confidence, 4),
+            'ai_probability': ai_probability,
+            'combined_ai_probability': combined_ai_prob,
+            'ai_votes': ai_votes,
+            'human_votes': human_votes,
+            'matched': matched,
+            'distance': distance,
+            'effective_weight': effective_weight,
+            'indicates_ai': indicates_ai,
+            'present': present,
+        }
+    
+    def classify_batch(self, feature_dicts: List[Dict[str, float]]) -> List[Tuple[str, float]]:
+        """Classify many clips in one vectorized call"""
+        X, present = self.feature_matrix(feature_dicts)
+        scores = self.score_matrix(X, present)
+        return [(str(c), float(conf)) for c, conf in zip(scores['classification'], scores['confidence'])]
+    
+    def classify(self, features: Dict[str, float], details: bool = True) -> Tuple[str, float, Dict]:
         """
         Classify based on ensemble of feature thresholds with soft voting
         Uses distance from threshold to weight votes more precisely
+        Per-feature vote details are only built when details=True
         """
-        ai_score = 0.0
-        human_score = 0.0
-        total_weight = 0.0
-        vote_details = {}
-        matched_features = 0
+        X, present = self.feature_matrix([features])
+        scores = self.score_matrix(X, present)
         
-        for feature_name, config in self.thresholds.items():
-            if feature_name not in features:
-                continue
-            
-            matched_features += 1
-            value = features[feature_name]
-            threshold = config['threshold']
-            direction = config['direction']
-            weight = config['weight']
-            ai_indicator = config['ai_indicator']
-            
-            # Calculate how far from threshold (normalized distance)
-            if direction == 'below':
-                # AI if value < threshold
-                if threshold != 0:
-                    distance = (threshold - value) / abs(threshold)
-                else:
-                    distance = -value if value > 0 else 1
-                indicates_ai = value < threshold
-            else:
-                # AI if value > threshold
-                if threshold != 0:
-                    distance = (value - threshold) / abs(threshold)
-                else:
-                    distance = value if value > 0 else -1
-                indicates_ai = value > threshold
-            
-            # Apply indicator logic
-            if not ai_indicator:
-                indicates_ai = not indicates_ai
-                distance = -distance
-            
-            # Soft voting: use sigmoid-like scaling for distance
-            # This gives stronger votes when far from threshold
-            confidence_factor = min(2.0, max(0.1, 1.0 + np.tanh(distance * 0.5)))
-            effective_weight = weight * confidence_factor
-            
-            # Cast vote with weighted confidence
-            if indicates_ai:
-                ai_score += effective_weight
-                vote_details[feature_name] = {'value': round(value, 4), 'threshold': threshold, 'vote': 'AI', 'weight': round(effective_weight, 3), 'distance': round(distance, 3)}
-            else:
-                human_score += effective_weight
-                vote_details[feature_name] = {'value': round(value, 4), 'threshold': threshold, 'vote': 'HUMAN', 'weight': round(effective_weight, 3), 'distance': round(distance, 3)}
-            
-            total_weight += effective_weight
+        vote_details = {}
+        if details:
+            for col in np.flatnonzero(present[0]):
+                feature_name = self.feature_names[col]
+                vote_details[feature_name] = {
+                    'value': round(features[feature_name], 4),
+                    'threshold': self.thresholds[feature_name]['threshold'],
+                    'vote': 'AI' if scores['indicates_ai'][0, col] else 'HUMAN',
+                    'weight': round(float(scores['effective_weight'][0, col]), 3),
+                    'distance': round(float(scores['distance'][0, col]), 3),
+                }
         
-        # Require minimum features for reliable classification
+        matched_features = int(scores['matched'][0])
         if matched_features < 5:
             logger.warning(f"Only {matched_features} features matched, using fallback")
             return "HUMAN", 0.55, vote_details
         
-        # Calculate final score
-        if total_weight > 0:
-            ai_probability = ai_score / total_weight
-        else:
-            ai_probability = 0.5
-        
         # Log voting summary
-        ai_vote_count = sum(1 for v in vote_details.values() if v['vote'] == 'AI')
-        human_vote_count = sum(1 for v in vote_details.values() if v['vote'] == 'HUMAN')
-        logger.info(f"Feature votes: AI={ai_vote_count}, HUMAN={human_vote_count}, AI_prob={ai_probability:.3f}")
-        
-        # Also consider raw vote ratio (gives equal weight to each feature type)
+        ai_vote_count = int(scores['ai_votes'][0])
+        human_vote_count = int(scores['human_votes'][0])
+        ai_probability = float(scores['ai_probability'][0])
+        combined_ai_prob = float(scores['combined_ai_probability'][0])
         raw_ai_ratio = ai_vote_count / max(1, ai_vote_count + human_vote_count)
-        
-        # Combine weighted probability with raw vote ratio for balanced decision
-        # This prevents high-weight features from dominating the decision
-        combined_ai_prob = 0.6 * ai_probability + 0.4 * raw_ai_ratio
+        logger.info(f"Feature votes: AI={ai_vote_count}, HUMAN={human_vote_count}, AI_prob={ai_probability:.3f}")
         logger.info(f"Weighted AI prob: {ai_probability:.3f}, Raw vote ratio: {raw_ai_ratio:.3f}, Combined: {combined_ai_prob:.3f}")
         
-        # Classification with adaptive threshold
-        decision_threshold = 0.50  # Use 0.5 for balanced decision
-        
-        if combined_ai_prob >= decision_threshold:
-            classification = "AI_GENERATED"
-            # Map [0.50, 1.0] -> [0.52, 0.98]
-            confidence = 0.52 + (combined_ai_prob - decision_threshold) * (0.98 - 0.52) / (1.0 - decision_threshold)
-        else:
-            classification = "HUMAN"
-            # Map [0.0, 0.50] -> [0.98, 0.52]
-            confidence = 0.98 - (combined_ai_prob / decision_threshold) * (0.98 - 0.52)
-        
-        # Ensure confidence is in valid range and reflects certainty
-        confidence = min(0.98, max(0.52, confidence))
-        
-        # Boost confidence if vote is very one-sided
-        vote_ratio = max(ai_vote_count, human_vote_count) / max(1, ai_vote_count + human_vote_count)
-        if vote_ratio > 0.75:
-            confidence = min(0.98, confidence * 1.05)
-        
-        return classification, round(confidence, 4), vote_details
+        return str(scores['classification'][0]), float(scores['confidence'][0]), vote_details
+
+
+def _check_mode(mode: str, research: bool):
+    """Reject unknown modes and option combinations a mode cannot honor"""
+    if mode not in DETECTOR_MODES:
+        raise ValueError(f"Unknown detection mode: {mode}")
+    if research and mode == "standard":
+        raise ValueError("research=True extracts every feature; it cannot be combined with mode='standard'")
+
+
+def detect_from_pcm(
+    y: np.ndarray,
+    sr: int,
+    mode: str = "full",
+    research: bool = False
+) -> Tuple[Literal["AI_GENERATED", "HUMAN"], float]:
+    """
+    Classify already-decoded mono PCM
+    Lets callers that decoded the clip themselves (the cascade) skip load_audio
+    Raises ValueError for research=True with mode="standard", which skips features by design
+    """
+    _check_mode(mode, research)
+    
+    # Check minimum audio length
+    if len(y) < sr * 0.5:  # Less than 0.5 seconds
+        logger.warning("Audio too short for reliable analysis")
+        return "HUMAN", 0.55
+    
+    # Normalize audio
+    y = librosa.util.normalize(y)
+    
+    # Shared spectral intermediates, computed at most once per clip
+    analyzer = AdvancedVoiceAnalyzer()
+    ctx = analyzer.create_context(y, sr)
+    
+    # Extract features; by default only those the classifier consumes
+    classifier = EnsembleClassifier()
+    wanted = None if research else classifier.thresholds.keys()
+    if mode == "standard":
+        wanted = standard_features(classifier.thresholds.keys())
+    all_features = analyzer.extract_features(y, sr, ctx, wanted)
+    
+    logger.info(f"Total features extracted: {len(all_features)}")
+    
+    # Classify using ensemble (vote counts are logged by the classifier)
+    classification, confidence, _ = classifier.classify(all_features, details=False)
+    logger.info(f"Final classification: {classification} with confidence {confidence:.4f}")
+    
+    return classification, confidence
 
 
 def detect_ai_voice(
     audio_data: bytes,
-    language: str
+    language: str,
+    research: bool = False,
+    mode: str = "full",
+    max_seconds: Optional[float] = None,
+    audio_format: Optional[str] = None,
+    sample_rate: Optional[int] = None
 ) -> Tuple[Literal["AI_GENERATED", "HUMAN"], float]:
     """
     Main detection function - uses advanced multi-technique analysis
+    
+    Only features consumed by the classifier are computed unless research=True,
+    which extracts the full feature set (same decision, more CPU).
+    mode="standard" also skips the COSTLY_BLOCKS and votes on the rest, so
+    it cannot be combined with research=True (ValueError).
+    max_seconds limits the analysis to the start of long clips;
+    audio_format="pcm_s16le" and sample_rate describe headerless PCM
+    Raises DecodeError for audio no decoder can read
     """
-    logger.info(f"Starting advanced AI voice detection for {len(audio_data)} bytes, language: {language}")
+    _check_mode(mode, research)
+    logger.info(f"Starting advanced AI voice detection for {len(audio_data)} bytes, language: {language}, mode: {mode}")
     
     try:
         # Initialize analyzer
@@ -1010,92 +1364,22 @@ def detect_ai_voice(
         
         # Load audio
         try:
-            y, sr = analyzer.load_audio(audio_data)
+            y, sr = analyzer.load_audio(audio_data, max_seconds=max_seconds,
+                                        audio_format=audio_format, sample_rate=sample_rate)
             logger.info(f"Audio loaded: {len(y)} samples at {sr}Hz ({len(y)/sr:.2f} seconds)")
+        except DecodeError as e:
+            logger.error(f"Failed to load audio: {e}")
+            raise
         except Exception as e:
             logger.error(f"Failed to load audio: {e}")
             # Return uncertain result
             return "HUMAN", 0.55
         
-        # Check minimum audio length
-        if len(y) < sr * 0.5:  # Less than 0.5 seconds
-            logger.warning("Audio too short for reliable analysis")
-            return "HUMAN", 0.55
-        
-        # Normalize audio
-        y = librosa.util.normalize(y)
-        
-        # Extract all features
-        all_features = {}
-        
-        # 1. Spectral artifacts
-        logger.info("Analyzing spectral artifacts...")
-        spectral_features = analyzer.analyze_spectral_artifacts(y, sr)
-        all_features.update(spectral_features)
-        logger.info(f"Extracted {len(spectral_features)} spectral features")
-        
-        # 2. Temporal patterns
-        logger.info("Analyzing temporal patterns...")
-        temporal_features = analyzer.analyze_temporal_patterns(y, sr)
-        all_features.update(temporal_features)
-        logger.info(f"Extracted {len(temporal_features)} temporal features")
-        
-        # 3. MFCC patterns
-        logger.info("Analyzing MFCC patterns...")
-        mfcc_features = analyzer.analyze_mfcc_patterns(y, sr)
-        all_features.update(mfcc_features)
-        logger.info(f"Extracted {len(mfcc_features)} MFCC features")
-        
-        # 4. Pitch and prosody
-        logger.info("Analyzing pitch and prosody...")
-        pitch_features = analyzer.analyze_pitch_and_prosody(y, sr)
-        all_features.update(pitch_features)
-        logger.info(f"Extracted {len(pitch_features)} pitch features")
-        
-        # 5. Phase patterns
-        logger.info("Analyzing phase patterns...")
-        phase_features = analyzer.analyze_phase_patterns(y, sr)
-        all_features.update(phase_features)
-        logger.info(f"Extracted {len(phase_features)} phase features")
-        
-        # 6. Noise patterns
-        logger.info("Analyzing noise patterns...")
-        noise_features = analyzer.analyze_noise_patterns(y, sr)
-        all_features.update(noise_features)
-        logger.info(f"Extracted {len(noise_features)} noise features")
-        
-        # 7. Statistical moments
-        logger.info("Analyzing statistical moments...")
-        stat_features = analyzer.analyze_statistical_moments(y, sr)
-        all_features.update(stat_features)
-        logger.info(f"Extracted {len(stat_features)} statistical features")
-        
-        # 8. Micro-modulations (shimmer, jitter, formants)
-        logger.info("Analyzing micro-modulations...")
-        micro_features = analyzer.analyze_micro_modulations(y, sr)
-        all_features.update(micro_features)
-        logger.info(f"Extracted {len(micro_features)} micro-modulation features")
-        
-        # 9. Breath patterns (pauses, onsets, breath sounds)
-        logger.info("Analyzing breath patterns...")
-        breath_features = analyzer.analyze_breath_patterns(y, sr)
-        all_features.update(breath_features)
-        logger.info(f"Extracted {len(breath_features)} breath pattern features")
-        
-        logger.info(f"Total features extracted: {len(all_features)}")
-        
-        # Classify using ensemble
-        classifier = EnsembleClassifier()
-        classification, confidence, vote_details = classifier.classify(all_features)
-        
-        # Log key voting results
-        ai_votes = sum(1 for v in vote_details.values() if v['vote'] == 'AI')
-        human_votes = sum(1 for v in vote_details.values() if v['vote'] == 'HUMAN')
-        logger.info(f"Voting results: AI={ai_votes}, HUMAN={human_votes}")
-        logger.info(f"Final classification: {classification} with confidence {confidence:.4f}")
-        
-        return classification, confidence
+        return detect_from_pcm(y, sr, mode=mode, research=research)
         
+    except DecodeError:
+        # Undecodable input gets no verdict; the API answers it with a 400
+        raise
     except Exception as e:
         logger.error(f"Detection failed with error: {e}", exc_info=True)
         # Return uncertain result on failure
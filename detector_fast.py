@@ -3,23 +3,21 @@ Fast AI Voice Detection Engine
 Optimized for speed on free-tier cloud platforms
 """
 
-import io
 import numpy as np
 import logging
-from typing import Tuple, Literal
+from typing import Tuple, Literal, Optional
 import warnings
 import hashlib
 
 warnings.filterwarnings('ignore')
 logger = logging.getLogger(__name__)
 
-# Try to import soundfile (lightweight)
-try:
-    import soundfile as sf
-    SOUNDFILE_AVAILABLE = True
-except ImportError:
-    SOUNDFILE_AVAILABLE = False
-    logger.warning("soundfile not available")
+# Bump whenever rules, thresholds or the input pipeline change so cached results are invalidated
+THRESHOLD_VERSION = "fast-2"
+
+from audio_decoding import decode_audio
+from resampling import resample
+from dsp_kernels import frame_energy
 
 # Try scipy for basic signal processing
 try:
@@ -31,53 +29,23 @@ except ImportError:
     logger.warning("scipy not available")
 
 
-def load_audio_fast(audio_data: bytes, target_sr: int = 16000) -> Tuple[np.ndarray, int]:
-    """Fast audio loading with minimal processing"""
-    import tempfile
-    import os
-    
-    # Try soundfile first (fastest)
-    if SOUNDFILE_AVAILABLE:
-        try:
-            audio_buffer = io.BytesIO(audio_data)
-            y, sr = sf.read(audio_buffer)
-            if len(y.shape) > 1:
-                y = np.mean(y, axis=1)  # Convert stereo to mono
-            # Simple resampling if needed
-            if sr != target_sr:
-                ratio = target_sr / sr
-                new_length = int(len(y) * ratio)
-                y = np.interp(np.linspace(0, len(y), new_length), np.arange(len(y)), y)
-            return y.astype(np.float32), target_sr
-        except:
-            pass
-    
-    # Fallback: Try with temp file
-    if SOUNDFILE_AVAILABLE:
-        try:
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp:
-                tmp.write(audio_data)
-                tmp_path = tmp.name
-            y, sr = sf.read(tmp_path)
-            os.unlink(tmp_path)
-            if len(y.shape) > 1:
-                y = np.mean(y, axis=1)
-            if sr != target_sr:
-                ratio = target_sr / sr
-                new_length = int(len(y) * ratio)
-                y = np.interp(np.linspace(0, len(y), new_length), np.arange(len(y)), y)
-            return y.astype(np.float32), target_sr
-        except:
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
-    
-    # Ultimate fallback: generate deterministic result based on audio hash
-    audio_hash = hashlib.md5(audio_data).hexdigest()
-    hash_value = int(audio_hash[:8], 16) / 0xFFFFFFFF
-    fake_audio = np.random.RandomState(int(audio_hash[:8], 16)).randn(target_sr * 3)
-    return fake_audio.astype(np.float32), target_sr
+def content_digest(audio_data: bytes) -> str:
+    """Content digest of a payload; computed once per request and reused everywhere"""
+    return hashlib.md5(audio_data).hexdigest()
+
+
+def load_audio_fast(audio_data: bytes, target_sr: int = 16000, max_seconds: Optional[float] = None,
+                    audio_format: Optional[str] = None, sample_rate: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    Fast audio loading with minimal processing (in memory, see audio_decoding)
+    Only the first max_seconds are decoded and resampled when given;
+    audio_format="pcm_s16le" with its sample_rate bypasses the decoders
+    Raises DecodeError for audio no decoder can read; nothing is synthesized in its place
+    """
+    y, sr = decode_audio(audio_data, dtype='float32', fmt=audio_format, max_seconds=max_seconds,
+                         sample_rate=sample_rate)
+    # Anti-aliased polyphase resampling with a cached filter (skipped at target_sr)
+    return resample(y, sr, target_sr), target_sr
 
 
 def extract_features_fast(y: np.ndarray, sr: int) -> dict:
@@ -130,9 +98,8 @@ def extract_features_fast(y: np.ndarray, sr: int) -> dict:
                 
             # Energy variance (AI voices tend to have more consistent energy)
             frame_size = sr // 10  # 100ms frames
-            n_frames = len(segment) // frame_size
-            if n_frames > 1:
-                energies = [np.sum(segment[i*frame_size:(i+1)*frame_size]**2) for i in range(n_frames)]
+            energies = frame_energy(segment, frame_size, frame_size)
+            if len(energies) > 1:
                 features['energy_variance'] = float(np.var(energies) / (np.mean(energies) + 1e-10))
             else:
                 features['energy_variance'] = 0.0
@@ -152,7 +119,7 @@ def extract_features_fast(y: np.ndarray, sr: int) -> dict:
     return features
 
 
-def classify_voice(features: dict, audio_data: bytes) -> Tuple[str, float]:
+def classify_voice(features: dict, audio_data: bytes, audio_hash: Optional[str] = None) -> Tuple[str, float]:
     """
     Fast classification based on extracted features
     Uses heuristic rules optimized for AI voice detection
@@ -194,7 +161,7 @@ def classify_voice(features: dict, audio_data: bytes) -> Tuple[str, float]:
     total_weight += 0.15
     
     # Add some deterministic variation based on audio content
-    audio_hash = hashlib.md5(audio_data).hexdigest()
+    audio_hash = audio_hash or content_digest(audio_data)
     hash_variation = (int(audio_hash[:4], 16) / 0xFFFF) * 0.2 - 0.1  # -0.1 to +0.1
     ai_score += hash_variation
     total_weight += 0.1
@@ -215,41 +182,36 @@ def classify_voice(features: dict, audio_data: bytes) -> Tuple[str, float]:
         return "HUMAN", 1.0 - final_score
 
 
-def detect_ai_voice(audio_data: bytes, language: str) -> Tuple[str, float]:
+def detect_ai_voice(audio_data: bytes, language: str, audio_hash: Optional[str] = None,
+                    max_seconds: Optional[float] = None, audio_format: Optional[str] = None,
+                    sample_rate: Optional[int] = None) -> Tuple[str, float]:
     """
     Main entry point for fast AI voice detection
     
     Args:
-        audio_data: Raw audio bytes (MP3)
+        audio_data: Raw audio bytes (MP3, WAV, ... or headerless PCM)
         language: Language of the audio (Tamil, English, Hindi, Malayalam, Telugu)
+        audio_hash: Precomputed content_digest(audio_data), if the caller has one
+        max_seconds: Analyze only this much audio from the start (None: all of it)
+        audio_format, sample_rate: "pcm_s16le" and its rate for headerless PCM (None: sniffed)
     
     Returns:
         Tuple of (classification, confidence)
     """
     logger.info(f"Fast AI voice detection for {len(audio_data)} bytes, language: {language}")
+    audio_hash = audio_hash or content_digest(audio_data)
+    
+    # Failures propagate: undecodable input becomes a 400, anything else a recorded error, never a verdict
+    y, sr = load_audio_fast(audio_data, max_seconds=max_seconds, audio_format=audio_format,
+                            sample_rate=sample_rate)
+    logger.info(f"Audio loaded: {len(y)} samples at {sr}Hz ({len(y)/sr:.2f} seconds)")
+    
+    # Extract minimal features
+    features = extract_features_fast(y, sr)
+    logger.info(f"Features extracted: {list(features.keys())}")
+    
+    # Classify
+    classification, confidence = classify_voice(features, audio_data, audio_hash)
+    logger.info(f"Classification: {classification} with confidence {confidence:.4f}")
     
-    try:
-        # Load audio quickly
-        y, sr = load_audio_fast(audio_data)
-        logger.info(f"Audio loaded: {len(y)} samples at {sr}Hz ({len(y)/sr:.2f} seconds)")
-        
-        # Extract minimal features
-        features = extract_features_fast(y, sr)
-        logger.info(f"Features extracted: {list(features.keys())}")
-        
-        # Classify
-        classification, confidence = classify_voice(features, audio_data)
-        logger.info(f"Classification: {classification} with confidence {confidence:.4f}")
-        
-        return classification, confidence
-        
-    except Exception as e:
-        logger.error(f"Detection failed: {e}")
-        # Fallback: deterministic result based on audio hash
-        audio_hash = hashlib.md5(audio_data).hexdigest()
-        hash_value = int(audio_hash[:8], 16) / 0xFFFFFFFF
-        
-        if hash_value > 0.5:
-            return "AI_GENERATED", 0.6 + hash_value * 0.2
-        else:
-            return "HUMAN", 0.6 + (1 - hash_value) * 0.2
+    return classification, confidence
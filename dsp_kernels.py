@@ -0,0 +1,527 @@
+"""
+Fused NumPy kernels for the detector's per-clip DSP
+spectral_descriptors() derives every spectral-artifact descriptor from one
+float32 magnitude spectrogram, sharing the intermediate passes (column sums,
+one log, one time difference) that separate librosa calls each redo.
+autocorrelation() returns a bounded lag range in O(n log n) via one FFT.
+dominant_pitch() is librosa.piptrack plus the per-frame argmax the
+detector applied to it, vectorized over all frames at once.
+hpss_masks() is librosa's median-filter HPSS with an exact partition-based
+median filter in place of scipy.ndimage.median_filter.
+frame() and the frame_* reductions replace per-frame Python loops with
+strided views of the waveform; formant_peaks() picks F1/F2 proxies for a
+whole batch of frames with one FFT.
+WaveformMoments accumulates mean, central moments and extrema chunk by chunk
+in float64, and two accumulators merge exactly (Chan/Pebay pairwise updates).
+analytic_envelope() and low_frequency_bins() give the Hilbert envelope and its
+lowest DFT bins with memory bounded by a chunk, at any signal length.
+
+Tolerance: spectral_descriptors() matches librosa 0.11 spectral_centroid, spectral_bandwidth,
+spectral_rolloff, spectral_flatness, spectral_contrast and amplitude_to_db
+(plus the NumPy band/flux code they replace) to within 1e-5 relative. The
+differences come only from float summation order; rolloff is bit-exact
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from scipy.fft import irfft, next_fast_len, rfft
+except ImportError:
+    from numpy.fft import irfft, rfft
+
+    def next_fast_len(target: int, real: bool = True) -> int:
+        return target
+
+# librosa defaults the detector relies on
+ROLL_PERCENT = 0.85
+FLATNESS_AMIN = 1e-10  # on the power spectrum (flatness uses power=2)
+DB_AMIN = 1e-10  # power floor of amplitude_to_db / power_to_db
+TOP_DB = 80.0
+CONTRAST_FMIN = 200.0
+CONTRAST_BANDS = 6
+CONTRAST_QUANTILE = 0.02
+
+# librosa.piptrack defaults
+PITCH_FMIN = 150.0
+PITCH_FMAX = 4000.0
+PITCH_THRESHOLD = 0.1
+
+# librosa.decompose.hpss default median kernel (frames for harmonic, bins for percussive)
+HPSS_KERNEL = 31
+# Window elements partitioned per slab by median_filter (bounds its temporary copy)
+MEDIAN_CHUNK_ELEMENTS = 1 << 22
+
+# Formant proxies: peaks at least this fraction of the frame maximum, this many bins apart
+FORMANT_REL_HEIGHT = 0.1
+FORMANT_MIN_DISTANCE = 10
+
+# Samples per WaveformMoments chunk (float64 working set stays in cache)
+MOMENTS_CHUNK = 1 << 16
+
+# Hilbert envelope: samples per chunk and context kept on each side of it
+ENVELOPE_CHUNK = 1 << 17
+ENVELOPE_MARGIN = 1 << 15
+# Samples per direct-DFT step of low_frequency_bins
+LOW_BINS_CHUNK = 2048
+
+# Band layouts of the spectral-artifact features
+ENERGY_BANDS = 8
+SUBBAND_EDGES = (0.0, 0.25, 0.5, 0.75, 1.0)
+HIGH_FREQ_START = 0.7
+
+SPECTRAL_BLOCKS = ('smoothness', 'band_energy', 'high_low_ratio', 'flux', 'subband_flux',
+                   'centroid', 'bandwidth', 'rolloff', 'flatness', 'contrast')
+
+
+@lru_cache(maxsize=16)
+def fft_frequencies(sr: int, n_fft: int) -> np.ndarray:
+    """Bin center frequencies (librosa.fft_frequencies), read-only"""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+    freqs.setflags(write=False)
+    return freqs
+
+
+@lru_cache(maxsize=16)
+def contrast_bands(sr: int, n_fft: int, fmin: float = CONTRAST_FMIN, n_bands: int = CONTRAST_BANDS,
+                   quantile: float = CONTRAST_QUANTILE) -> Tuple[Tuple[int, int, int], ...]:
+    """
+    (start, stop, count) row slice and quantile count per octave band, built
+    exactly like librosa.feature.spectral_contrast builds its band masks
+    """
+    freq = fft_frequencies(sr, n_fft)
+    if fmin * 2.0 ** (n_bands - 1) >= 0.5 * sr:
+        raise ValueError("Frequency band exceeds Nyquist. Reduce either fmin or n_bands.")
+    octa = np.zeros(n_bands + 2)
+    octa[1:] = fmin * (2.0 ** np.arange(0, n_bands + 1))
+    bands = []
+    for k, (f_low, f_high) in enumerate(zip(octa[:-1], octa[1:])):
+        rows = np.flatnonzero((freq >= f_low) & (freq <= f_high))
+        start, stop = int(rows[0]), int(rows[-1]) + 1
+        if k > 0:
+            start -= 1
+        if k == n_bands:
+            stop = len(freq)
+        count = max(int(np.rint(quantile * (stop - start))), 1)
+        if k < n_bands:
+            stop -= 1  # librosa drops the top bin shared with the next band
+        bands.append((start, stop, count))
+    return tuple(bands)
+
+
+def _power_to_db(x: np.ndarray) -> np.ndarray:
+    """librosa.power_to_db(x) with ref=1.0, amin=1e-10, top_db=80"""
+    db = 10.0 * np.log10(np.maximum(DB_AMIN, x))
+    return np.maximum(db, db.max() - TOP_DB)
+
+
+def spectral_descriptors(S: np.ndarray, sr: int, n_fft: int,
+                         blocks: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Per-frame spectral descriptors of a magnitude spectrogram S (bins x frames)
+    blocks selects the SPECTRAL_BLOCKS to compute (None: all). Returns
+    smoothness and high_low_ratio as scalars, band_energy (ENERGY_BANDS,),
+    flux (frames-1,), subband_flux (4, frames-1), contrast (bands+1, frames)
+    and centroid/bandwidth/rolloff/flatness (frames,)
+    """
+    wanted = set(SPECTRAL_BLOCKS if blocks is None else blocks)
+    S = np.asarray(S, dtype=np.float32)
+    n_bins, n_frames = S.shape
+    out: Dict[str, np.ndarray] = {}
+
+    # Sweep 1: per-bin totals over time feed every band-average feature
+    if wanted & {'band_energy', 'high_low_ratio'}:
+        bin_totals = S.sum(axis=1, dtype=np.float64)
+        if 'band_energy' in wanted:
+            size = n_bins // ENERGY_BANDS
+            out['band_energy'] = bin_totals[:size * ENERGY_BANDS].reshape(ENERGY_BANDS, size).sum(axis=1) \
+                / (size * n_frames)
+        if 'high_low_ratio' in wanted:
+            split = int(n_bins * HIGH_FREQ_START)
+            high = bin_totals[split:].sum() / ((n_bins - split) * n_frames)
+            low = bin_totals[:split].sum() / (split * n_frames)
+            out['high_low_ratio'] = high / (low + 1e-10)
+
+    # Sweep 2: one matrix product gives each frame's energy and first two frequency moments
+    if wanted & {'centroid', 'bandwidth'}:
+        freq = fft_frequencies(sr, n_fft)
+        moments = np.stack([np.ones_like(freq), freq, freq * freq]) @ S.astype(np.float64)
+        total, first, second = moments
+        # librosa.util.normalize(norm=1) leaves (near-)silent frames unscaled
+        norm = np.where(total < np.finfo(S.dtype).tiny, 1.0, total)
+        centroid = first / norm
+        if 'centroid' in wanted:
+            out['centroid'] = centroid
+        if 'bandwidth' in wanted:
+            variance = (second - 2.0 * centroid * first + centroid * centroid * total) / norm
+            out['bandwidth'] = np.sqrt(np.maximum(variance, 0.0))
+
+    # Sweep 3: cumulative energy along frequency
+    if 'rolloff' in wanted:
+        cumulative = np.cumsum(S, axis=0)
+        reached = cumulative >= ROLL_PERCENT * cumulative[-1]
+        out['rolloff'] = fft_frequencies(sr, n_fft)[np.argmax(reached, axis=0)]
+
+    # Sweep 4: a single log of the floored power spectrum serves flatness and smoothness
+    if wanted & {'flatness', 'smoothness'}:
+        power = np.square(S)
+        np.maximum(power, FLATNESS_AMIN, out=power)
+        log_power = np.log(power)
+        if 'flatness' in wanted:
+            out['flatness'] = np.exp(log_power.mean(axis=0)) / power.mean(axis=0)
+        if 'smoothness' in wanted:
+            # amplitude_to_db(S, ref=np.max) floors at DB_AMIN, equal to FLATNESS_AMIN; the
+            # reference offset cancels in the frequency difference, only the 80 dB floor remains
+            np.maximum(log_power, log_power.max() - TOP_DB * np.log(10.0) / 10.0, out=log_power)
+            step = np.diff(log_power, axis=0)
+            out['smoothness'] = float(np.abs(step, out=step).mean(dtype=np.float64) * 10.0 / np.log(10.0))
+
+    # Sweep 5: one squared time difference, reduced per sub-band and in total
+    if wanted & {'flux', 'subband_flux'}:
+        change = np.subtract(S[:, 1:], S[:, :-1])
+        np.square(change, out=change)
+        edges = [int(n_bins * edge) for edge in SUBBAND_EDGES]
+        partial = np.empty((len(edges) - 1, n_frames - 1), dtype=np.float64)
+        for i, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+            change[start:stop].sum(axis=0, dtype=np.float64, out=partial[i])
+        if 'subband_flux' in wanted:
+            out['subband_flux'] = np.sqrt(partial)
+        if 'flux' in wanted:
+            out['flux'] = np.sqrt(partial.sum(axis=0))
+
+    # Octave-band peak/valley means by partial selection instead of a full sort
+    if 'contrast' in wanted:
+        bands = contrast_bands(sr, n_fft)
+        peak = np.empty((len(bands), n_frames), dtype=np.float32)
+        valley = np.empty_like(peak)
+        for k, (start, stop, count) in enumerate(bands):
+            rows = stop - start
+            ordered = np.partition(S[start:stop], sorted({count - 1, rows - count}), axis=0)
+            valley[k] = ordered[:count].mean(axis=0)
+            peak[k] = ordered[rows - count:].mean(axis=0)
+        out['contrast'] = _power_to_db(peak) - _power_to_db(valley)
+
+    return out
+
+
+def autocorrelation(y: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    Raw autocorrelation sum_j y[j] * y[j + k] for lags k = 0..max_lag
+    One zero-padded real FFT, O(n log n) whatever the lag range, where
+    np.correlate costs O(n * lags); float64 throughout, so it agrees with
+    np.correlate to float rounding (relative to lag 0)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    max_lag = max(0, min(int(max_lag), len(y) - 1))
+    # Padding to n + max_lag keeps circular wrap-around out of the lags returned
+    size = next_fast_len(len(y) + max_lag, real=True)
+    spectrum = rfft(y, size)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return irfft(power, size)[:max_lag + 1]
+
+
+def dominant_pitch(S: np.ndarray, sr: int, n_fft: int, fmin: float = PITCH_FMIN, fmax: float = PITCH_FMAX,
+                   threshold: float = PITCH_THRESHOLD) -> np.ndarray:
+    """
+    Per-frame frequency of the strongest parabolically interpolated spectral
+    peak in [fmin, fmax), 0 for frames without one
+    Same values as librosa.piptrack followed by pitches[mags[:, t].argmax(), t]
+    per frame, without the per-frame loop; the float32/float64 mix of
+    librosa's numba stencils is mirrored so peaks and ties resolve identically
+    """
+    S = np.abs(np.asarray(S, dtype=np.float32))
+    n_bins, n_frames = S.shape
+    f0 = np.zeros(n_frames, dtype=np.float32)
+    freqs = fft_frequencies(sr, n_fft)
+    rows = np.flatnonzero((max(fmin, 0) <= freqs) & (freqs < min(fmax, sr / 2)))
+    if rows.size == 0 or n_bins < 3:
+        return f0
+    lo, hi = int(rows[0]), int(rows[-1]) + 1
+
+    # Bins lo..hi-1 plus one neighbour on each side are all the band needs
+    start, stop = max(lo - 1, 0), min(hi + 1, n_bins)
+    window = S[start:stop]
+    gated = window * (window > threshold * S.max(axis=0))
+    centre = slice(lo - start, hi - start)
+
+    # Local maxima after zeroing bins below threshold * frame peak
+    # (the first bin is never one, the last only has to exceed its neighbour)
+    around = np.empty((hi - lo + 2, n_frames), dtype=np.float32)
+    around[0] = gated[lo - 1 - start] if lo > 0 else np.inf
+    around[-1] = gated[hi - start] if hi < n_bins else -np.inf
+    around[1:-1] = gated[centre]
+    peaks = (around[1:-1] > around[:-2]) & (around[1:-1] >= around[2:])
+
+    # Parabolic offset of each bin's optimum and the slope there; 0 at the spectrum edges
+    shift = np.zeros((hi - lo, n_frames), dtype=np.float32)
+    slope = np.zeros_like(shift)
+    first, last = max(lo, 1), min(hi, n_bins - 1)
+    if first < last:
+        left, mid, right = S[first - 1:last - 1], S[first:last], S[first + 1:last + 1]
+        a = (right + left).astype(np.float64) - 2 * mid.astype(np.float64)
+        b = (right - left).astype(np.float64) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift[first - lo:last - lo] = np.where(np.abs(b) >= np.abs(a), 0.0, -b / a)
+        slope[first - lo:last - lo] = (right - left) / 2.0  # np.gradient's central difference
+
+    # Interpolated peak heights (piptrack's mags); the strongest per frame wins
+    height = S[lo:hi] + 0.5 * slope * shift
+    height[~peaks] = 0
+    best = np.argmax(height, axis=0)
+    frames = np.arange(n_frames)
+    # A frame whose best height is not positive has no peak (piptrack's argmax lands on an empty bin)
+    voiced = height[best, frames] > 0
+    f0[voiced] = (best[voiced] + lo + shift[best[voiced], frames[voiced]]) * float(sr) / n_fft
+    return f0
+
+
+def median_filter(S: np.ndarray, size: int, axis: int) -> np.ndarray:
+    """
+    Running median of odd length size along one axis of a 2-D array, with
+    reflected edges: the values of scipy.ndimage.median_filter(mode='reflect')
+    for a 1-D kernel, by partitioning strided windows in bounded slabs
+    """
+    half = size // 2
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (half, half)
+    padded = np.pad(S, pad, mode='symmetric')  # ndimage 'reflect' repeats the edge sample
+    out = np.empty_like(S)
+    other = 1 - axis
+    step = max(1, MEDIAN_CHUNK_ELEMENTS // (S.shape[axis] * size))
+    for start in range(0, S.shape[other], step):
+        slab = [slice(None), slice(None)]
+        slab[other] = slice(start, start + step)
+        windows = sliding_window_view(padded[tuple(slab)], size, axis=axis)
+        out[tuple(slab)] = np.partition(windows, half, axis=-1)[..., half]
+    return out
+
+
+def hpss_masks(S: np.ndarray, kernel_size: int = HPSS_KERNEL,
+               max_bin: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Soft harmonic and percussive masks of a magnitude spectrogram, as
+    librosa.decompose.hpss(S, mask=True) with power 2 and margin 1
+    With max_bin only the bins below it are separated, a cheaper band-limited
+    run; the bins above go wholly to the percussive mask
+    """
+    band = S if max_bin is None else S[:max_bin]
+    harm = median_filter(band, kernel_size, axis=1)
+    perc = median_filter(band, kernel_size, axis=0)
+
+    # librosa.util.softmask, split_zeros=True
+    scale = np.maximum(harm, perc)
+    silent = scale < np.finfo(scale.dtype).tiny
+    scale[silent] = 1
+    harm_share = (harm / scale) ** 2
+    perc_share = (perc / scale) ** 2
+    total = harm_share + perc_share
+    mask_harm = np.zeros_like(S)
+    mask_perc = np.ones_like(S)
+    mask_harm[:len(band)] = np.divide(harm_share, total, out=np.full_like(total, 0.5), where=~silent)
+    mask_perc[:len(band)] = np.divide(perc_share, total, out=np.full_like(total, 0.5), where=~silent)
+    return mask_harm, mask_perc
+
+
+def frame(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """
+    Read-only (n_frames, frame_length) strided view of y, without copying;
+    frames start every hop_length samples and only whole frames are kept
+    (n_frames = (len(y) - frame_length) // hop_length + 1, no padding)
+    """
+    y = np.asarray(y)
+    if len(y) < frame_length:
+        return np.empty((0, frame_length), dtype=y.dtype)
+    return sliding_window_view(y, frame_length)[::hop_length]
+
+
+def frame_max_abs(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """Peak absolute amplitude of every frame"""
+    return frame(np.abs(y), frame_length, hop_length).max(axis=1, initial=0)
+
+
+def frame_energy(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """Sum of squares of every frame"""
+    return frame(np.square(y), frame_length, hop_length).sum(axis=1)
+
+
+def frame_rms(y: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    """Root mean square of every frame"""
+    return np.sqrt(frame(np.square(y), frame_length, hop_length).mean(axis=1))
+
+
+def formant_peaks(frames: np.ndarray, sr: int, rel_height: float = FORMANT_REL_HEIGHT,
+                  distance: int = FORMANT_MIN_DISTANCE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Frequencies of the two strongest spectral peaks of every Hann-windowed frame
+    (F1/F2 proxies) and a mask of the frames that have two
+    Same picks as scipy.signal.find_peaks(height=rel_height * max, distance=distance)
+    followed by the two highest peaks: the strongest local maximum always
+    survives the distance pruning, the runner-up is the strongest one at least
+    distance bins away from it
+    """
+    frames = np.asarray(frames)
+    n_frames, length = frames.shape
+    spectrum = np.abs(rfft(frames * np.hanning(length), axis=1))[:, :length // 2]
+    freqs = fft_frequencies(sr, length)[:length // 2]
+
+    inner = spectrum[:, 1:-1]
+    heights = np.full_like(spectrum, -np.inf)
+    peak = (inner > spectrum[:, :-2]) & (inner > spectrum[:, 2:]) & \
+        (inner >= rel_height * spectrum.max(axis=1, keepdims=True))
+    heights[:, 1:-1][peak] = inner[peak]
+
+    rows = np.arange(n_frames)
+    first = heights.argmax(axis=1)
+    far = np.abs(np.arange(spectrum.shape[1]) - first[:, None]) >= distance
+    runner_up = np.where(far, heights, -np.inf)
+    second = runner_up.argmax(axis=1)
+    valid = np.isfinite(heights[rows, first]) & np.isfinite(runner_up[rows, second])
+    return np.stack([freqs[first], freqs[second]], axis=1), valid
+
+
+class WaveformMoments:
+    """
+    Mergeable running statistics of a signal: count, mean, central moment sums
+    M2..M4 and extrema, updated chunk by chunk so the signal is read once
+    skewness and kurtosis are the biased estimators of scipy.stats.skew and
+    scipy.stats.kurtosis (Fisher); both are nan for a constant signal
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    @classmethod
+    def of(cls, y: np.ndarray, chunk: int = MOMENTS_CHUNK) -> "WaveformMoments":
+        """Statistics of a whole signal, accumulated MOMENTS_CHUNK samples at a time"""
+        moments = cls()
+        for start in range(0, len(y), chunk):
+            moments.update(y[start:start + chunk])
+        return moments
+
+    def update(self, chunk: np.ndarray) -> "WaveformMoments":
+        """Fold a chunk of samples in"""
+        chunk = np.asarray(chunk).ravel()
+        if chunk.size == 0:
+            return self
+        x = chunk.astype(np.float64)
+        part = WaveformMoments()
+        part.count = x.size
+        part.mean = float(np.mean(x))
+        d = x - part.mean
+        d2 = d * d
+        part.m2 = float(np.sum(d2))
+        part.m3 = float(np.dot(d2, d))
+        part.m4 = float(np.dot(d2, d2))
+        # Extrema stay in the signal's dtype, as np.min / np.max would return them
+        part.minimum = np.min(chunk)
+        part.maximum = np.max(chunk)
+        return self.merge(part)
+
+    def merge(self, other: "WaveformMoments") -> "WaveformMoments":
+        """Combine with the statistics of another (disjoint) chunk, in place"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        na, nb = self.count, other.count
+        n = na + nb
+        delta = other.mean - self.mean
+        m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+        m3 = (self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / n ** 2
+              + 3 * delta * (na * other.m2 - nb * self.m2) / n)
+        m4 = (self.m4 + other.m4 + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+              + 6 * delta ** 2 * (na * na * other.m2 + nb * nb * self.m2) / n ** 2
+              + 4 * delta * (na * other.m3 - nb * self.m3) / n)
+        self.count = n
+        self.mean += delta * nb / n
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def var(self) -> float:
+        return self.m2 / self.count if self.count else np.nan
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.var))
+
+    @property
+    def peak(self) -> float:
+        """Largest absolute sample"""
+        return max(abs(self.minimum), abs(self.maximum))
+
+    @property
+    def mean_square(self) -> float:
+        return self.var + self.mean ** 2
+
+    def _constant(self) -> bool:
+        # scipy.stats treats a variance below float rounding of the mean as zero
+        return self.var <= (np.finfo(np.float64).resolution * self.mean) ** 2
+
+    @property
+    def skewness(self) -> float:
+        if not self.count or self._constant():
+            return np.nan
+        return (self.m3 / self.count) / self.var ** 1.5
+
+    @property
+    def kurtosis(self) -> float:
+        if not self.count or self._constant():
+            return np.nan
+        return (self.m4 / self.count) / self.var ** 2 - 3.0
+
+
+def analytic_envelope(y: np.ndarray, chunk: int = ENVELOPE_CHUNK, margin: int = ENVELOPE_MARGIN) -> np.ndarray:
+    """
+    Magnitude of the analytic signal (np.abs(scipy.signal.hilbert(y))) in float32
+    Each chunk is transformed with margin samples of context on both sides at
+    a fast real-FFT length, so memory beyond the output stays O(chunk). The
+    Hilbert kernel decays as 1/n, so the cut-off context costs about 1e-3 of
+    the signal RMS per sample; the clip ends are treated as silence instead of
+    wrapping around
+    """
+    y = np.asarray(y, dtype=np.float32)
+    n = len(y)
+    envelope = np.empty(n, dtype=np.float32)
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        lo, hi = max(start - margin, 0), min(stop + margin, n)
+        size = next_fast_len(hi - lo, real=True)
+        spectrum = rfft(y[lo:hi], size)
+        # Hilbert transform: -j on positive frequencies, DC and Nyquist dropped
+        spectrum *= -1j
+        spectrum[0] = 0
+        if size % 2 == 0:
+            spectrum[-1] = 0
+        quadrature = irfft(spectrum, size)[start - lo:stop - lo]
+        envelope[start:stop] = np.hypot(y[start:stop], quadrature)
+    return envelope
+
+
+def low_frequency_bins(x: np.ndarray, bins: int, chunk: int = LOW_BINS_CHUNK) -> np.ndarray:
+    """
+    First bins of the length-len(x) DFT of x (np.fft.fft(x)[:bins]) by direct
+    summation chunk by chunk: O(bins * n) time, O(bins * chunk) memory and no
+    full-length transform at an FFT-unfriendly length
+    """
+    n = len(x)
+    bins = max(0, min(bins, n))
+    k = np.arange(bins)
+    twiddle = np.exp(-2j * np.pi * np.outer(np.arange(min(chunk, n)), k) / n)
+    total = np.zeros(bins, dtype=np.complex128)
+    for start in range(0, n, chunk):
+        part = np.asarray(x[start:start + chunk], dtype=np.float64)
+        total += np.exp(-2j * np.pi * k * start / n) * (part @ twiddle[:len(part)])
+    return total
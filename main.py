@@ -3,17 +3,39 @@ AI-Generated Voice Detection API
 Multi-language support: Tamil, English, Hindi, Malayalam, Telugu
 """
 
-from fastapi import FastAPI, Header, HTTPException, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, validator
-from typing import Literal, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, PrivateAttr, model_validator, validator
+from typing import Dict, List, Literal, Optional, Tuple
+import asyncio
 import base64
+import time
 import uuid
-import io
+import json
 import os
 from datetime import datetime
 import logging
 
+from worker_pool import DetectionPool, detect_in_worker
+from result_cache import ResultCache
+from detector_fast import content_digest
+from audio_decoding import DecodeError, DecoderStats
+from audio_probe import ProbeError, probe_audio
+from modes import DEFAULT_DETECTION_MODE, DETECTION_MODES, ModeMetrics, estimate_cost, mode_version, mode_versions
+
+# python-multipart moved from the "multipart" to the "python_multipart" package name in 0.0.13
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# orjson is optional; it only speeds up JSON encoding of dict payloads
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,47 +46,173 @@ app = FastAPI(
     version="1.0.0"
 )
 
+class ContentLengthGuard:
+    """
+    ASGI middleware rejecting bodies whose Content-Length exceeds a per-path
+    limit, before any of the body is read or parsed
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.limits:
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.limits[scope["path"]]:
+                        response = JSONResponse(
+                            status_code=413,
+                            content={"detail": {"status": "error", "message": "Request body too large"}}
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+
 # Supported languages
 SUPPORTED_LANGUAGES = ["Tamil", "English", "Hindi", "Malayalam", "Telugu"]
+SUPPORTED_LANGUAGE_NAMES = {name.lower(): name for name in SUPPORTED_LANGUAGES}
 
 # API Key Management (In production, use environment variables and database)
 VALID_API_KEYS = set(os.environ.get("API_KEYS", "test-key-123,guvi-api-key-2024").split(","))
 
+# Detection runs in worker processes so the event loop stays responsive
+detection_pool = DetectionPool()
+
+# Results keyed by content digest, so resubmitted clips skip decode and analysis
+result_cache = ResultCache()
+
+# Per-mode request counts, latencies and SLO breaches
+mode_metrics = ModeMetrics()
+
+# Rules version per mode for cache keys, resolved by a worker at startup
+MODE_VERSIONS: Dict[str, str] = {}
+
+# Decoder attempts and timings, merged from every worker's results
+decoder_stats = DecoderStats()
+
+# Largest audio payload accepted, in decoded bytes
+MAX_AUDIO_BYTES = int(os.environ.get("MAX_AUDIO_BYTES", str(10 * 1024 * 1024)))
+
+# Longest clip accepted, in seconds of audio as stated by its headers (0 disables the check)
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", "300"))
+
+# Largest JSON body for the single-clip endpoint: base64 of MAX_AUDIO_BYTES plus room for the other fields
+MAX_JSON_BODY_BYTES = (MAX_AUDIO_BYTES + 2) // 3 * 4 + 64 * 1024
+
+# Accepted audioFormat values; containers are sniffed from their bytes, headerless PCM needs sampleRate
+AUDIO_FORMATS = ("mp3", "wav", "pcm_s16le")
+PCM_SAMPLE_RATE_RANGE = (8000, 192000)
+
+# Content types accepted as a raw upload body (multipart/form-data is handled separately)
+UPLOAD_CONTENT_TYPES = ("audio/", "application/octet-stream")
+
+# Room for multipart boundaries, part headers and small form fields on top of MAX_AUDIO_BYTES
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Batch limits: clips per request, clips analyzed at once per batch and the JSON body size
+BATCH_MAX_CLIPS = int(os.environ.get("BATCH_MAX_CLIPS", "1000"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", max(1, detection_pool.workers)))
+MAX_BATCH_BODY_BYTES = int(os.environ.get("MAX_BATCH_BODY_BYTES", str(64 * 1024 * 1024)))
+
+app.add_middleware(ContentLengthGuard, limits={
+    "/api/voice-detection": MAX_JSON_BODY_BYTES,
+    "/api/voice-detection/batch": MAX_BATCH_BODY_BYTES,
+})
+
+
+def decode_audio_base64(audio_b64: str) -> bytes:
+    """Decode a base64 audio payload, tolerating missing padding and the URL-safe alphabet"""
+    padding = -len(audio_b64) % 4
+    if padding:
+        audio_b64 += '=' * padding
+    if '-' in audio_b64 or '_' in audio_b64:
+        return base64.urlsafe_b64decode(audio_b64)
+    return base64.b64decode(audio_b64)
+
+
+def dumps(payload) -> bytes:
+    """Compact JSON encoding, through orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
 
 class VoiceRequest(BaseModel):
     """Request model for voice detection"""
     language: Literal["Tamil", "English", "Hindi", "Malayalam", "Telugu"] = Field(
         ..., description="Language of the audio sample"
     )
-    audioFormat: Literal["mp3"] = Field(
-        default="mp3", description="Audio format (currently supports mp3)"
+    audioFormat: Literal["mp3", "wav", "pcm_s16le"] = Field(
+        default="mp3", description="Audio format: mp3, wav or headerless 16-bit little-endian mono PCM"
     )
     audioBase64: str = Field(
-        ..., description="Base64 encoded MP3 audio file"
+        ..., description="Base64 encoded audio file (or raw PCM samples)"
+    )
+    sampleRate: Optional[int] = Field(
+        default=None, ge=PCM_SAMPLE_RATE_RANGE[0], le=PCM_SAMPLE_RATE_RANGE[1],
+        description="Sample rate in Hz; required for pcm_s16le, ignored otherwise"
+    )
+    mode: Optional[Literal["fast", "standard", "full", "cascade"]] = Field(
+        default=None,
+        description="Detection mode: fast heuristics, standard feature subset, full ensemble "
+                    "or cascade (fast, escalating to full when uncertain)"
     )
     
     class Config:
         populate_by_name = True  # Accept both snake_case and camelCase
 
+    # Decoded audio, filled in once by decode_audio; the endpoint reuses it
+    _audio_data: Optional[bytes] = PrivateAttr(default=None)
+
     @validator('audioBase64')
     def validate_base64(cls, v):
         """Validate base64 string"""
         if not v or len(v) < 50:
             raise ValueError("Audio data is too short or empty")
+        return v
+
+    @model_validator(mode='after')
+    def check_sample_rate(self):
+        """Headerless PCM cannot be read without its sample rate"""
+        if self.audioFormat == "pcm_s16le" and self.sampleRate is None:
+            raise ValueError("sampleRate is required for pcm_s16le audio")
+        return self
+
+    @model_validator(mode='after')
+    def decode_audio(self):
+        """Decode the base64 payload exactly once"""
         try:
-            # Add padding if needed
-            padding = 4 - len(v) % 4
-            if padding != 4:
-                v = v + '=' * padding
-            # Test decode
-            base64.b64decode(v)
+            self._audio_data = decode_audio_base64(self.audioBase64)
         except Exception:
-            # Try URL-safe base64
-            try:
-                base64.urlsafe_b64decode(v)
-            except Exception:
-                raise ValueError("Invalid base64 encoding")
-        return v
+            raise ValueError("Invalid base64 encoding")
+        return self
+
+    @property
+    def audio_data(self) -> bytes:
+        return self._audio_data
+
+
+class BatchClip(BaseModel):
+    """One clip of a batch; checked per item so a bad clip only fails itself"""
+    id: Optional[str] = Field(
+        default=None, description="Caller-supplied clip identifier, echoed in the result line"
+    )
+    language: str = Field(..., description="Language of the audio sample")
+    audioFormat: str = Field(default="mp3", description="Audio format: mp3, wav or pcm_s16le")
+    audioBase64: str = Field(..., description="Base64 encoded audio file (or raw PCM samples)")
+    sampleRate: Optional[int] = Field(default=None, description="Sample rate in Hz; required for pcm_s16le")
+    mode: Optional[str] = Field(default=None, description="Detection mode for this clip")
+
+
+class BatchRequest(BaseModel):
+    """Request model for batch voice detection"""
+    clips: List[BatchClip] = Field(..., min_length=1, max_length=BATCH_MAX_CLIPS, description="Clips to analyze")
+    mode: Optional[Literal["fast", "standard", "full", "cascade"]] = Field(
+        default=None, description="Default detection mode for clips without their own"
+    )
 
 
 class SuccessResponse(BaseModel):
@@ -74,6 +222,9 @@ class SuccessResponse(BaseModel):
     classification: Literal["AI_GENERATED", "HUMAN"]
     confidenceScore: float = Field(..., ge=0.0, le=1.0)
     explanation: str
+    decidedBy: Optional[str] = Field(
+        default=None, description="Detection tier that produced the verdict"
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -102,6 +253,21 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.on_event("startup")
+async def start_detection_pool():
+    """Spin up and pre-warm detection workers"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, detection_pool.start)
+    # Resolve rules versions up front, inside a worker: detector.py (librosa) stays out of this process
+    MODE_VERSIONS.update(await detection_pool.run(mode_versions))
+
+
+@app.on_event("shutdown")
+async def stop_detection_pool():
+    """Release detection workers"""
+    detection_pool.shutdown()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -109,7 +275,9 @@ async def root():
         "service": "AI Voice Detection API",
         "status": "online",
         "version": "1.0.0",
-        "supported_languages": SUPPORTED_LANGUAGES
+        "supported_languages": SUPPORTED_LANGUAGES,
+        "detection_modes": list(DETECTION_MODES),
+        "default_mode": DEFAULT_DETECTION_MODE
     }
 
 
@@ -122,6 +290,261 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime counters for monitoring"""
+    return {
+        "cache": result_cache.stats(),
+        "modes": mode_metrics.stats(),
+        "decoders": decoder_stats.stats()
+    }
+
+
+def explain(classification: str) -> str:
+    """Human-readable explanation for a classification"""
+    if classification == "AI_GENERATED":
+        return "Unnatural pitch consistency and robotic speech patterns detected"
+    return "Natural voice characteristics and human speech patterns detected"
+
+
+def pcm_source(audio_format: Optional[str], sample_rate: Optional[int]) -> Tuple[Optional[str], Optional[int]]:
+    """
+    (audio_format, sample_rate) to hand to the detectors: containers are
+    sniffed from their bytes, so only headerless PCM keeps its format and rate
+    """
+    if audio_format == "pcm_s16le":
+        return audio_format, sample_rate
+    return None, None
+
+
+def admit_audio(audio_data: bytes, audio_format: Optional[str] = None,
+                sample_rate: Optional[int] = None) -> Optional[float]:
+    """
+    Probe the container headers (microseconds, no decoding) and reject what
+    cannot or should not be analyzed with an HTTPException
+    Returns the stated duration in seconds, or None when the headers do not give one
+    """
+    try:
+        probe = probe_audio(audio_data, audio_format, sample_rate)
+    except ProbeError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "message": f"Audio could not be decoded: {e}"
+            }
+        )
+    duration = probe["duration_seconds"]
+    if duration is not None and MAX_AUDIO_SECONDS and duration > MAX_AUDIO_SECONDS:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "status": "error",
+                "message": f"Audio is {duration:.1f} seconds long, the limit is {MAX_AUDIO_SECONDS:g}"
+            }
+        )
+    return duration
+
+
+async def run_detection(audio_data: bytes, language: str, mode: str, request_id: str,
+                        audio_seconds: Optional[float] = None, audio_format: Optional[str] = None,
+                        sample_rate: Optional[int] = None) -> Tuple[str, float, str]:
+    """
+    Detect one decoded clip: cache lookup, worker-pool analysis and metrics
+    audio_format and sample_rate come from pcm_source()
+    Returns (classification, confidence, tier); raises asyncio.TimeoutError
+    when analysis exceeds the pool timeout and DecodeError for unreadable audio
+    """
+    started = time.perf_counter()
+    cost = estimate_cost(mode, audio_seconds)
+    
+    # Content digest computed once; keys the cache and seeds the detector
+    digest = content_digest(audio_data)
+    # The same PCM bytes at another rate are another clip
+    cache_digest = digest if audio_format is None else f"{digest}:{audio_format}@{sample_rate}"
+    # mode_version() here only when startup did not resolve the versions (it imports the engines)
+    cache_key = result_cache.make_key(cache_digest, mode, MODE_VERSIONS.get(mode) or mode_version(mode))
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit for request {request_id}")
+        mode_metrics.record(mode, time.perf_counter() - started, cached=True, tier=cached[2],
+                            audio_seconds=audio_seconds, cost=0.0)
+        return cached
+    
+    try:
+        result, decoder_delta = await detection_pool.run(detect_in_worker, audio_data, language, digest, mode,
+                                                         audio_format, sample_rate)
+    except asyncio.TimeoutError:
+        logger.error(f"Detection timed out for request {request_id}")
+        mode_metrics.record(mode, time.perf_counter() - started, outcome="timeout",
+                            audio_seconds=audio_seconds, cost=cost)
+        raise
+    except Exception:
+        mode_metrics.record(mode, time.perf_counter() - started, outcome="error",
+                            audio_seconds=audio_seconds, cost=cost)
+        raise
+    
+    decoder_stats.merge(decoder_delta)
+    result_cache.put(cache_key, result)
+    mode_metrics.record(mode, time.perf_counter() - started, tier=result[2],
+                        audio_seconds=audio_seconds, cost=cost)
+    return result
+
+
+async def detect_and_respond(audio_data: bytes, language: str, mode: str, request_id: str,
+                             audio_format: Optional[str] = None, sample_rate: Optional[int] = None) -> Response:
+    """Validate decoded audio, run detection and build the API response"""
+    audio_format, sample_rate = pcm_source(audio_format, sample_rate)
+    # Validate audio data
+    if len(audio_data) > MAX_AUDIO_BYTES:
+        raise payload_too_large()
+    if len(audio_data) < 1000:  # Too small to be valid MP3
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "message": "Audio file is too small or corrupted"
+            }
+        )
+    audio_seconds = admit_audio(audio_data, audio_format, sample_rate)
+    cost = estimate_cost(mode, audio_seconds)
+    logger.info(f"Request {request_id}: {audio_seconds} s of audio, estimated cost {cost} CPU s")
+    
+    # Perform detection (cached by content digest) on the worker pool
+    try:
+        classification, confidence, tier = await run_detection(
+            audio_data,
+            language.lower(),  # Convert to lowercase for detector
+            mode,
+            request_id,
+            audio_seconds,
+            audio_format,
+            sample_rate
+        )
+    except DecodeError:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "message": "Audio could not be decoded"
+            }
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail={
+                "status": "error",
+                "message": "Audio analysis timed out"
+            }
+        )
+    
+    response = SuccessResponse(
+        status="success",
+        language=language,
+        classification=classification,
+        confidenceScore=round(confidence, 2),
+        explanation=explain(classification),
+        decidedBy=tier
+    )
+    # Serialize straight to JSON bytes (pydantic-core), skipping FastAPI's re-validation and encoder
+    headers = {"X-Estimated-Cost": str(cost)} if cost is not None else None
+    return Response(content=response.model_dump_json(), media_type="application/json", headers=headers)
+
+
+def payload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail={
+            "status": "error",
+            "message": f"Audio exceeds the {MAX_AUDIO_BYTES} byte limit"
+        }
+    )
+
+
+def bad_multipart(message: str) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail={
+            "status": "error",
+            "message": message
+        }
+    )
+
+
+async def read_upload_body(request: Request) -> bytearray:
+    """Stream a raw request body into one buffer, enforcing MAX_AUDIO_BYTES as it arrives"""
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        if len(buffer) > MAX_AUDIO_BYTES:
+            raise payload_too_large()
+    return buffer
+
+
+async def read_multipart_file(request: Request, field: str = "file") -> bytearray:
+    """
+    Stream a multipart/form-data body into one buffer holding the named file part
+    Nothing is spooled to disk: the part is capped at MAX_AUDIO_BYTES and the
+    whole body at MULTIPART_OVERHEAD_BYTES more, both enforced as it arrives
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise bad_multipart("Multipart upload without a boundary")
+    
+    buffer = bytearray()
+    part = {"field": b"", "value": b"", "headers": {}, "capture": False, "found": False}
+    
+    def on_part_begin():
+        part["headers"] = {}
+        part["capture"] = False
+    
+    def on_header_field(data: bytes, start: int, end: int):
+        part["field"] += data[start:end]
+    
+    def on_header_value(data: bytes, start: int, end: int):
+        part["value"] += data[start:end]
+    
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+    
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        # Only the first file part with the expected name is kept
+        part["capture"] = (not part["found"] and options.get(b"name") == field.encode()
+                           and b"filename" in options)
+        part["found"] = part["found"] or part["capture"]
+    
+    def on_part_data(data: bytes, start: int, end: int):
+        if part["capture"]:
+            buffer.extend(data[start:end])
+            if len(buffer) > MAX_AUDIO_BYTES:
+                raise payload_too_large()
+    
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_AUDIO_BYTES + MULTIPART_OVERHEAD_BYTES:
+            raise payload_too_large()
+        try:
+            parser.write(chunk)
+        except ValueError as e:
+            raise bad_multipart(f"Malformed multipart body: {e}")
+    parser.finalize()
+    if not part["found"]:
+        raise bad_multipart(f"Multipart upload needs a \"{field}\" part")
+    return buffer
+
+
 @app.post("/api/voice-detection", response_model=SuccessResponse)
 async def detect_voice(
     request: VoiceRequest,
@@ -149,60 +572,13 @@ async def detect_voice(
     
     # Generate unique request ID for logging purposes
     request_id = str(uuid.uuid4())
-    logger.info(f"Processing request {request_id} for language: {request.language}")
+    mode = request.mode or DEFAULT_DETECTION_MODE
+    logger.info(f"Processing request {request_id} for language: {request.language}, mode: {mode}")
     
     try:
-        # Decode audio
-        try:
-            audio_b64 = request.audioBase64
-            # Add padding if needed
-            padding = 4 - len(audio_b64) % 4
-            if padding != 4:
-                audio_b64 = audio_b64 + '=' * padding
-            audio_data = base64.b64decode(audio_b64)
-        except Exception as e:
-            logger.error(f"Base64 decode error: {str(e)}")
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "status": "error",
-                    "message": "Failed to decode base64 audio data"
-                }
-            )
-        
-        # Validate audio data
-        if len(audio_data) < 1000:  # Too small to be valid MP3
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "status": "error",
-                    "message": "Audio file is too small or corrupted"
-                }
-            )
-        
-        # Import fast detector (optimized for cloud deployment)
-        from detector_fast import detect_ai_voice
-        
-        # Perform detection
-        classification, confidence = detect_ai_voice(
-            audio_data=audio_data,
-            language=request.language.lower()  # Convert to lowercase for detector
-        )
-        
-        # Generate explanation based on classification
-        if classification == "AI_GENERATED":
-            explanation = "Unnatural pitch consistency and robotic speech patterns detected"
-        else:
-            explanation = "Natural voice characteristics and human speech patterns detected"
-        
-        # Return response
-        return SuccessResponse(
-            status="success",
-            language=request.language,
-            classification=classification,
-            confidenceScore=round(confidence, 2),
-            explanation=explanation
-        )
+        # Audio was decoded once during request validation
+        return await detect_and_respond(request.audio_data, request.language, mode, request_id,
+                                        request.audioFormat, request.sampleRate)
         
     except HTTPException:
         raise
@@ -226,6 +602,218 @@ async def detect_voice(
         )
 
 
+@app.post("/api/voice-detection/upload", response_model=SuccessResponse)
+async def detect_voice_upload(
+    request: Request,
+    language: Optional[str] = Query(None, description="Language of the audio sample"),
+    mode: Optional[str] = Query(None, description="Detection mode"),
+    x_language: Optional[str] = Header(None, alias="x-language"),
+    audio_format: Optional[str] = Query(None, alias="format", description="Audio format (mp3, wav, pcm_s16le)"),
+    sample_rate: Optional[int] = Query(None, description="Sample rate in Hz, required for pcm_s16le"),
+    x_detection_mode: Optional[str] = Header(None, alias="x-detection-mode"),
+    x_audio_format: Optional[str] = Header(None, alias="x-audio-format"),
+    x_sample_rate: Optional[int] = Header(None, alias="x-sample-rate"),
+    x_api_key: Optional[str] = Header(None, alias="x-api-key")
+):
+    """
+    Detect from an audio file sent as is, without base64
+    
+    The body is either the raw audio (Content-Type audio/* or
+    application/octet-stream) or multipart/form-data with a "file" part.
+    Language, mode, format and sample_rate come from the query string or the
+    x-language, x-detection-mode, x-audio-format and x-sample-rate headers
+    (query wins); language is case-insensitive. Headerless PCM is sent as
+    format=pcm_s16le with its sample_rate
+    """
+    # Authenticate
+    if not verify_api_key(x_api_key):
+        raise HTTPException(
+            status_code=401,
+            detail={
+                "status": "error",
+                "message": "Invalid or missing API key"
+            }
+        )
+    
+    language = SUPPORTED_LANGUAGE_NAMES.get((language or x_language or "").strip().lower())
+    if language is None:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "message": f"language is required and must be one of {SUPPORTED_LANGUAGES}"
+            }
+        )
+    mode = (mode or x_detection_mode or DEFAULT_DETECTION_MODE).strip().lower()
+    if mode not in DETECTION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "message": f"mode must be one of {list(DETECTION_MODES)}"
+            }
+        )
+    audio_format = (audio_format or x_audio_format or "mp3").strip().lower()
+    sample_rate = sample_rate or x_sample_rate
+    if audio_format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "message": f"format must be one of {list(AUDIO_FORMATS)}"
+            }
+        )
+    if audio_format == "pcm_s16le" and not (
+            sample_rate and PCM_SAMPLE_RATE_RANGE[0] <= sample_rate <= PCM_SAMPLE_RATE_RANGE[1]):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "message": f"sample_rate between {PCM_SAMPLE_RATE_RANGE[0]} and {PCM_SAMPLE_RATE_RANGE[1]} "
+                           f"is required for pcm_s16le audio"
+            }
+        )
+    
+    # Reject oversized uploads before reading them (multipart framing gets some slack)
+    content_type = request.headers.get("content-type", "").lower()
+    is_multipart = content_type.startswith("multipart/form-data")
+    declared_length = request.headers.get("content-length")
+    if declared_length and declared_length.isdigit() and \
+            int(declared_length) > MAX_AUDIO_BYTES + (MULTIPART_OVERHEAD_BYTES if is_multipart else 0):
+        raise payload_too_large()
+    
+    request_id = str(uuid.uuid4())
+    logger.info(f"Processing upload {request_id} for language: {language}, mode: {mode}, type: {content_type}")
+    
+    try:
+        if is_multipart:
+            audio_data = await read_multipart_file(request)
+        elif content_type.startswith(UPLOAD_CONTENT_TYPES):
+            audio_data = await read_upload_body(request)
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail={
+                    "status": "error",
+                    "message": "Send audio/* or application/octet-stream, or multipart/form-data with a \"file\" part"
+                }
+            )
+        
+        return await detect_and_respond(audio_data, language, mode, request_id, audio_format, sample_rate)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Detection error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "message": "Failed to process audio sample"
+            }
+        )
+
+
+async def detect_batch_clip(index: int, clip: BatchClip, default_mode: str, request_id: str,
+                            semaphore: asyncio.Semaphore) -> dict:
+    """Analyze one batch clip and build its NDJSON result; never raises"""
+    result = {"index": index, "id": clip.id}
+    mode = clip.mode or default_mode
+    if clip.language not in SUPPORTED_LANGUAGES:
+        return {**result, "status": "error", "message": f"Unsupported language: {clip.language}"}
+    if clip.audioFormat not in AUDIO_FORMATS:
+        return {**result, "status": "error", "message": f"Unsupported audio format: {clip.audioFormat}"}
+    audio_format, sample_rate = pcm_source(clip.audioFormat, clip.sampleRate)
+    if audio_format is not None and not (
+            sample_rate and PCM_SAMPLE_RATE_RANGE[0] <= sample_rate <= PCM_SAMPLE_RATE_RANGE[1]):
+        return {**result, "status": "error",
+                "message": f"sampleRate between {PCM_SAMPLE_RATE_RANGE[0]} and {PCM_SAMPLE_RATE_RANGE[1]} "
+                           f"is required for {audio_format} audio"}
+    if mode not in DETECTION_MODES:
+        return {**result, "status": "error", "message": f"Unknown detection mode: {mode}"}
+    
+    async with semaphore:
+        try:
+            audio_data = decode_audio_base64(clip.audioBase64)
+        except Exception:
+            return {**result, "status": "error", "message": "Failed to decode base64 audio data"}
+        if len(audio_data) > MAX_AUDIO_BYTES:
+            return {**result, "status": "error", "message": f"Audio exceeds the {MAX_AUDIO_BYTES} byte limit"}
+        if len(audio_data) < 1000:
+            return {**result, "status": "error", "message": "Audio file is too small or corrupted"}
+        try:
+            audio_seconds = admit_audio(audio_data, audio_format, sample_rate)
+        except HTTPException as e:
+            return {**result, "status": "error", "message": e.detail["message"]}
+        
+        try:
+            classification, confidence, tier = await run_detection(
+                audio_data, clip.language.lower(), mode, f"{request_id}/{index}", audio_seconds,
+                audio_format, sample_rate
+            )
+        except DecodeError:
+            return {**result, "status": "error", "message": "Audio could not be decoded"}
+        except asyncio.TimeoutError:
+            return {**result, "status": "error", "message": "Audio analysis timed out"}
+        except Exception as e:
+            logger.error(f"Batch {request_id} clip {index} failed: {str(e)}", exc_info=True)
+            return {**result, "status": "error", "message": "Failed to process audio sample"}
+    
+    return {
+        **result,
+        "status": "success",
+        "language": clip.language,
+        "classification": classification,
+        "confidenceScore": round(confidence, 2),
+        "explanation": explain(classification),
+        "decidedBy": tier,
+    }
+
+
+@app.post("/api/voice-detection/batch")
+async def detect_voice_batch(
+    request: BatchRequest,
+    x_api_key: Optional[str] = Header(None, alias="x-api-key")
+):
+    """
+    Detect many clips in one request
+    
+    Clips are analyzed concurrently (at most BATCH_CONCURRENCY at a time) and
+    one NDJSON line is streamed per clip as soon as it finishes, so lines
+    arrive out of order; use "index" or "id" to match them to clips.
+    A failing clip yields a line with status "error" and does not stop the batch
+    """
+    # Authenticate once for the whole batch
+    if not verify_api_key(x_api_key):
+        raise HTTPException(
+            status_code=401,
+            detail={
+                "status": "error",
+                "message": "Invalid or missing API key"
+            }
+        )
+    
+    request_id = str(uuid.uuid4())
+    default_mode = request.mode or DEFAULT_DETECTION_MODE
+    logger.info(f"Processing batch {request_id}: {len(request.clips)} clips, default mode: {default_mode}")
+    
+    async def stream_results():
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(detect_batch_clip(index, clip, default_mode, request_id, semaphore))
+            for index, clip in enumerate(request.clips)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield dumps(await next_done) + b"\n"
+        finally:
+            # Client went away or the batch finished; drop anything still queued
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
@@ -0,0 +1,216 @@
+"""
+Detection modes
+fast: heuristic detector_fast, standard: cheap subset of the detector.py
+features, full: the complete detector.py ensemble, cascade: fast first and
+full only when the fast verdict is not confident enough
+"""
+
+import os
+import threading
+import logging
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DETECTION_MODES = ("fast", "standard", "full", "cascade")
+
+DEFAULT_DETECTION_MODE = os.environ.get("DEFAULT_DETECTION_MODE", "fast").strip().lower()
+if DEFAULT_DETECTION_MODE not in DETECTION_MODES:
+    logger.warning(f"Unknown DEFAULT_DETECTION_MODE {DEFAULT_DETECTION_MODE!r}, using 'fast'")
+    DEFAULT_DETECTION_MODE = "fast"
+
+# Latency objective per mode in seconds; breaches are counted, not enforced
+MODE_SLO_SECONDS = {
+    "fast": float(os.environ.get("SLO_FAST_SECONDS", "2")),
+    "standard": float(os.environ.get("SLO_STANDARD_SECONDS", "5")),
+    "full": float(os.environ.get("SLO_FULL_SECONDS", "15")),
+    "cascade": float(os.environ.get("SLO_CASCADE_SECONDS", "15")),
+}
+
+# Seconds analyzed from the start of a clip per mode; the rest is never decoded (0 analyzes everything)
+MODE_ANALYSIS_SECONDS = {
+    "fast": float(os.environ.get("ANALYSIS_FAST_SECONDS", "30")),
+    "standard": float(os.environ.get("ANALYSIS_STANDARD_SECONDS", "60")),
+    "full": float(os.environ.get("ANALYSIS_FULL_SECONDS", "60")),
+}
+
+# Cascade: fast verdicts at or above this confidence are final, the rest escalate
+CASCADE_MARGIN = float(os.environ.get("CASCADE_MARGIN", "0.75"))
+
+# Latency samples kept per mode for percentiles
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "1024"))
+
+# Approximate CPU seconds spent per second of audio; cascade is budgeted at the full price
+MODE_COST_PER_AUDIO_SECOND = {
+    "fast": 0.002,
+    "standard": 0.05,
+    "full": 0.35,
+    "cascade": 0.35,
+}
+
+
+def estimate_cost(mode: str, audio_seconds: Optional[float]) -> Optional[float]:
+    """Expected CPU seconds for a clip of the probed duration, within the mode's analysis window (None if unknown)"""
+    if audio_seconds is None:
+        return None
+    window = analysis_seconds(mode)
+    analyzed = min(audio_seconds, window) if window else audio_seconds
+    return round(MODE_COST_PER_AUDIO_SECOND[mode] * analyzed, 4)
+
+
+def detect(audio_data: bytes, language: str, mode: str, audio_hash: Optional[str] = None,
+           audio_format: Optional[str] = None, sample_rate: Optional[int] = None) -> Tuple[str, float, str]:
+    """
+    Run one detection mode (engines are imported lazily so fast-only workers never load librosa)
+    audio_format="pcm_s16le" with sample_rate marks headerless PCM; other payloads are sniffed
+    Returns (classification, confidence, tier) where tier is the mode that decided
+    """
+    if mode == "fast":
+        from detector_fast import detect_ai_voice
+        return detect_ai_voice(audio_data=audio_data, language=language, audio_hash=audio_hash,
+                               max_seconds=MODE_ANALYSIS_SECONDS["fast"] or None,
+                               audio_format=audio_format, sample_rate=sample_rate) + ("fast",)
+    if mode in ("standard", "full"):
+        from detector import detect_ai_voice
+        return detect_ai_voice(audio_data=audio_data, language=language, mode=mode,
+                               max_seconds=MODE_ANALYSIS_SECONDS[mode] or None,
+                               audio_format=audio_format, sample_rate=sample_rate) + (mode,)
+    if mode == "cascade":
+        return detect_cascade(audio_data, language, audio_hash, audio_format=audio_format, sample_rate=sample_rate)
+    raise ValueError(f"Unknown detection mode: {mode}")
+
+
+def detect_cascade(audio_data: bytes, language: str, audio_hash: Optional[str] = None,
+                   margin: float = CASCADE_MARGIN, audio_format: Optional[str] = None,
+                   sample_rate: Optional[int] = None) -> Tuple[str, float, str]:
+    """
+    Fast heuristics first; escalate to the full ensemble below the margin
+    The PCM decoded for the fast tier is handed to the ensemble as is; it is
+    decoded once, up to the longer of the two tiers' analysis windows
+    """
+    from detector_fast import content_digest, load_audio_fast, extract_features_fast, classify_voice
+    audio_hash = audio_hash or content_digest(audio_data)
+    
+    # Undecodable audio is the client's error, not a verdict
+    y, sr = load_audio_fast(audio_data, max_seconds=analysis_seconds("cascade"),
+                            audio_format=audio_format, sample_rate=sample_rate)
+    # A failing fast tier leaves no verdict at all; the error reaches the caller
+    fast_y = _window(y, sr, MODE_ANALYSIS_SECONDS["fast"])
+    classification, confidence = classify_voice(extract_features_fast(fast_y, sr), audio_data, audio_hash)
+    
+    if confidence >= margin:
+        logger.info(f"Cascade decided by fast tier: {classification} ({confidence:.4f} >= {margin})")
+        return classification, confidence, "fast"
+    
+    logger.info(f"Cascade escalating: fast confidence {confidence:.4f} < {margin}")
+    try:
+        from detector import detect_from_pcm
+        full = detect_from_pcm(_window(y, sr, MODE_ANALYSIS_SECONDS["full"]), sr, mode="full")
+    except Exception as e:
+        # Keep the real fast verdict rather than inventing one
+        logger.error(f"Cascade full tier failed, keeping the fast verdict: {e}", exc_info=True)
+        return classification, confidence, "fast"
+    return full + ("full",)
+
+
+def _window(y, sr: int, seconds: float):
+    """Leading seconds of a clip (all of it for 0)"""
+    return y[:int(seconds * sr)] if seconds else y
+
+
+def analysis_seconds(mode: str) -> Optional[float]:
+    """Longest stretch of audio a mode decodes, or None when it decodes whole clips"""
+    if mode == "cascade":
+        windows = (MODE_ANALYSIS_SECONDS["fast"], MODE_ANALYSIS_SECONDS["full"])
+        return None if not all(windows) else max(windows)
+    return MODE_ANALYSIS_SECONDS[mode] or None
+
+
+@lru_cache(maxsize=None)
+def mode_version(mode: str) -> str:
+    """Rules version and analysis window of a mode, used to key cached results"""
+    if mode == "fast":
+        from detector_fast import THRESHOLD_VERSION
+        return f"{THRESHOLD_VERSION}-w{MODE_ANALYSIS_SECONDS['fast']:g}"
+    from detector import EnsembleClassifier
+    if mode == "cascade":
+        return (f"cascade-{mode_version('fast')}-{EnsembleClassifier().version()}"
+                f"-w{MODE_ANALYSIS_SECONDS['full']:g}-{CASCADE_MARGIN}")
+    return f"{mode}-{EnsembleClassifier().version()}-w{MODE_ANALYSIS_SECONDS[mode]:g}"
+
+
+def mode_versions() -> Dict[str, str]:
+    """mode_version() of every mode; run in a worker so the API process never imports detector.py"""
+    return {mode: mode_version(mode) for mode in DETECTION_MODES}
+
+
+class ModeMetrics:
+    """Thread-safe per-mode request counters with a rolling latency window"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._counters = {
+            mode: {"requests": 0, "cache_hits": 0, "timeouts": 0, "errors": 0, "slo_breaches": 0,
+                   "decided_by": {}, "audio_seconds": 0.0, "estimated_cost_seconds": 0.0}
+            for mode in DETECTION_MODES
+        }
+        self._latencies = {mode: deque(maxlen=max(1, window)) for mode in DETECTION_MODES}
+
+    def record(self, mode: str, latency: float, cached: bool = False, outcome: str = "ok",
+               tier: Optional[str] = None, audio_seconds: Optional[float] = None,
+               cost: Optional[float] = None):
+        """
+        Record one request; outcome is "ok", "timeout" or "error", tier is the deciding mode
+        audio_seconds and cost are the probed duration and its estimate_cost()
+        """
+        with self._lock:
+            counters = self._counters[mode]
+            counters["requests"] += 1
+            if audio_seconds is not None:
+                counters["audio_seconds"] += audio_seconds
+            if cost is not None:
+                counters["estimated_cost_seconds"] += cost
+            if tier is not None:
+                counters["decided_by"][tier] = counters["decided_by"].get(tier, 0) + 1
+            if cached:
+                counters["cache_hits"] += 1
+            if outcome == "timeout":
+                counters["timeouts"] += 1
+            elif outcome == "error":
+                counters["errors"] += 1
+            if latency > MODE_SLO_SECONDS[mode]:
+                counters["slo_breaches"] += 1
+            self._latencies[mode].append(latency)
+
+    @staticmethod
+    def _percentile(ordered: list, q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for mode in DETECTION_MODES:
+                counters = dict(self._counters[mode])
+                counters["decided_by"] = dict(counters["decided_by"])
+                ordered = sorted(self._latencies[mode])
+                requests = counters["requests"]
+                counters["audio_seconds"] = round(counters["audio_seconds"], 3)
+                counters["estimated_cost_seconds"] = round(counters["estimated_cost_seconds"], 4)
+                counters["slo_seconds"] = MODE_SLO_SECONDS[mode]
+                counters["slo_compliance"] = round(1 - counters["slo_breaches"] / requests, 4) if requests else 1.0
+                counters["latency_seconds"] = {
+                    "p50": round(self._percentile(ordered, 0.50), 4),
+                    "p95": round(self._percentile(ordered, 0.95), 4),
+                    "p99": round(self._percentile(ordered, 0.99), 4),
+                    "max": round(ordered[-1], 4),
+                    "mean": round(sum(ordered) / len(ordered), 4),
+                } if ordered else {}
+                if mode == "cascade":
+                    decided = sum(counters["decided_by"].values())
+                    counters["margin"] = CASCADE_MARGIN
+                    counters["escalation_rate"] = round(
+                        counters["decided_by"].get("full", 0) / decided, 4) if decided else 0.0
+                result[mode] = counters
+            return result
@@ -0,0 +1,59 @@
+"""
+Cached polyphase resampling
+Anti-aliased rational-rate conversion (scipy.signal.resample_poly) in float32,
+with the low-pass filter designed once per rate pair instead of on every call
+"""
+
+import logging
+from functools import lru_cache
+from math import gcd
+from typing import Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy import signal
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    logger.warning("scipy not available, resampling falls back to linear interpolation")
+
+# Filter design resample_poly uses by default: Kaiser window, 10 zero crossings per side
+FILTER_WINDOW = ("kaiser", 5.0)
+FILTER_HALF_LENGTH = 10
+
+
+def rate_ratio(orig_sr: int, target_sr: int) -> Tuple[int, int]:
+    """Smallest (up, down) with target_sr / orig_sr == up / down"""
+    common = gcd(int(orig_sr), int(target_sr))
+    return int(target_sr) // common, int(orig_sr) // common
+
+
+@lru_cache(maxsize=32)
+def polyphase_filter(up: int, down: int) -> np.ndarray:
+    """
+    FIR low-pass for an up/down conversion, exactly as resample_poly designs it
+    Cached per ratio and returned read-only (resample_poly copies it before scaling)
+    """
+    max_rate = max(up, down)
+    taps = signal.firwin(2 * FILTER_HALF_LENGTH * max_rate + 1, 1.0 / max_rate, window=FILTER_WINDOW)
+    taps = taps.astype(np.float32)
+    taps.setflags(write=False)
+    return taps
+
+
+def resample(y: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """
+    Resample mono audio to target_sr as float32
+    Returns the input as is (no copy) when the rates already match
+    """
+    y = np.asarray(y, dtype=np.float32)
+    if orig_sr == target_sr or len(y) == 0:
+        return y
+    up, down = rate_ratio(orig_sr, target_sr)
+    if not SCIPY_AVAILABLE:
+        positions = np.arange(len(y) * up // down) * (down / up)
+        return np.interp(positions, np.arange(len(y)), y).astype(np.float32)
+    return signal.resample_poly(y, up, down, window=polyphase_filter(up, down))
@@ -0,0 +1,54 @@
+"""
+Scaling test of the temporal autocorrelation
+Checks the FFT autocorrelation against np.correlate on a short clip, then
+times it from 1 second to 10 minutes of audio: time per sample must stay
+roughly flat (O(n log n)), where np.correlate grows linearly with length
+"""
+import time
+
+import numpy as np
+
+from dsp_kernels import autocorrelation
+
+SR = 22050  # detector.py analysis rate
+DURATIONS = (1, 10, 60, 300, 600)  # seconds
+MAX_PER_SAMPLE_GROWTH = 4.0  # allowed growth of time per sample from 10 s to 10 min
+
+
+def timed(y: np.ndarray, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        autocorrelation(y, len(y) - len(y) // 2 - 1)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def test_matches_np_correlate():
+    # Same lags and values as the np.correlate(y, y, mode='same') it replaced
+    y = np.random.RandomState(0).randn(2 * SR).astype(np.float32)
+    reference = np.correlate(y.astype(np.float64), y.astype(np.float64), mode='same')[len(y) // 2:]
+    fft_based = autocorrelation(y, len(y) - len(y) // 2 - 1)
+    assert len(fft_based) == len(reference)
+    error = np.max(np.abs(reference - fft_based)) / reference[0]
+    print(f"matches np.correlate: {len(fft_based)} lags, max error {error:.1e} of lag 0")
+    assert error < 1e-9
+
+
+def test_time_per_sample_stays_flat():
+    rng = np.random.RandomState(0)
+    per_sample = {}
+    for seconds in DURATIONS:
+        y = rng.randn(seconds * SR).astype(np.float32)
+        elapsed = timed(y)
+        per_sample[seconds] = elapsed / len(y)
+        print(f"   {seconds:4d} s: {elapsed * 1000:8.1f} ms ({per_sample[seconds] * 1e9:.1f} ns/sample)")
+    growth = per_sample[DURATIONS[-1]] / per_sample[10]
+    print(f"time per sample grows {growth:.2f}x from 10 s to {DURATIONS[-1] // 60} min "
+          f"(limit {MAX_PER_SAMPLE_GROWTH}x)")
+    assert growth < MAX_PER_SAMPLE_GROWTH
+
+
+if __name__ == "__main__":
+    test_matches_np_correlate()
+    test_time_per_sample_stays_flat()
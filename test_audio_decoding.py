@@ -0,0 +1,102 @@
+"""
+Decoder fallback tests
+decode_audio falls back when a backend fails and tries the winner first next
+time; a backend is suspended (demoted, never dropped) only after failures
+another backend overcame, and undecodable uploads never count against any
+"""
+import time
+
+import numpy as np
+import pytest
+
+import audio_decoding
+from audio_decoding import DECODERS, DecodeError, decode_audio, decoder_order
+
+SR = 16000
+CORRUPT_WAV = b"RIFF\x00\x00\x00\x00WAVE" + b"\x00" * 6000
+
+pytestmark = pytest.mark.skipif(not DECODERS["soundfile"][0], reason="needs soundfile for the fallback order")
+
+
+def broken_decoder(buffer, dtype, max_seconds=None):
+    raise RuntimeError("simulated backend failure")
+
+
+@pytest.fixture(autouse=True)
+def fresh_order():
+    """Start and leave every test with no preferred, failing or suspended decoder"""
+    states = (audio_decoding._preferred, audio_decoding._failures, audio_decoding._suspended_until)
+    for state in states:
+        state.clear()
+    yield
+    for state in states:
+        state.clear()
+
+
+@pytest.fixture
+def tone(make_wav):
+    t = np.arange(SR) / SR
+    return lambda channels=1: make_wav(0.3 * np.sin(2 * np.pi * 220 * t), SR, channels)
+
+
+@pytest.fixture
+def broken_soundfile(monkeypatch):
+    monkeypatch.setitem(DECODERS, "soundfile", (True, broken_decoder))
+
+
+def test_wav_tries_soundfile_first():
+    assert decoder_order("wav") == ["soundfile", "wave"]
+
+
+def test_falls_back_and_prefers_the_winner(tone, monkeypatch):
+    reference, _ = decode_audio(tone())
+    monkeypatch.setitem(DECODERS, "soundfile", (True, broken_decoder))
+    y, sr = decode_audio(tone())
+    assert sr == SR
+    np.testing.assert_allclose(y, reference, atol=1e-6)
+    assert decoder_order("wav")[0] == "wave"
+    assert audio_decoding._failures[("wav", "soundfile")] == 1
+
+
+def test_repeated_overcome_failures_suspend_per_format(tone, broken_soundfile):
+    for _ in range(audio_decoding.DECODER_FAILURE_LIMIT):
+        audio_decoding._preferred.clear()
+        decode_audio(tone())
+    audio_decoding._preferred.clear()
+    assert ("wav", "soundfile") in audio_decoding._suspended_until
+    assert decoder_order("wav") == ["wave", "soundfile"]
+    assert decoder_order("flac")[0] == "soundfile"
+
+
+def test_expired_suspension_restores_the_order():
+    audio_decoding._suspended_until[("wav", "soundfile")] = time.monotonic() - 1
+    assert decoder_order("wav") == ["soundfile", "wave"]
+
+
+def test_success_clears_the_failure_count(tone):
+    audio_decoding._failures[("wav", "soundfile")] = audio_decoding.DECODER_FAILURE_LIMIT - 1
+    decode_audio(tone())
+    assert ("wav", "soundfile") not in audio_decoding._failures
+
+
+def test_undecodable_uploads_suspend_nothing():
+    for _ in range(3 * audio_decoding.DECODER_FAILURE_LIMIT):
+        with pytest.raises(DecodeError):
+            decode_audio(CORRUPT_WAV)
+    assert not audio_decoding._failures
+    assert not audio_decoding._suspended_until
+    assert decoder_order("wav") == ["soundfile", "wave"]
+
+
+def test_stereo_is_averaged_and_max_seconds_bounds_the_decode(tone):
+    reference, _ = decode_audio(tone())
+    stereo, _ = decode_audio(tone(channels=2))
+    assert stereo.ndim == 1
+    np.testing.assert_allclose(stereo, reference, atol=1e-6)
+    window, _ = decode_audio(tone(), max_seconds=0.25)
+    assert len(window) == SR // 4
+
+
+def test_pcm_needs_a_sample_rate():
+    with pytest.raises(DecodeError):
+        decode_audio(b"\x00\x00" * 100, fmt="pcm_s16le")
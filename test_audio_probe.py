@@ -0,0 +1,103 @@
+"""
+Header probing tests
+audio_probe accepts real MP3, WAV and FLAC files with the right duration and
+rejects free-format MP3 streams, false frame syncs, truncated headers and
+empty fmt/STREAMINFO blocks with ProbeError
+"""
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from audio_probe import ProbeError, probe_audio
+
+sf = pytest.importorskip("soundfile")
+
+SR = 16000
+SECONDS = 2.0
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding, stereo: 417-byte frames
+CBR_HEADER = b"\xff\xfb\x90\x00"
+CBR_FRAME = CBR_HEADER + b"\x00" * 413
+CBR_STREAM = CBR_FRAME * 100
+CBR_SECONDS = round(len(CBR_STREAM) * 8 / 128000, 3)
+FREE_FORMAT_HEADER = b"\xff\xfb\x00\x00"  # bitrate index 0
+ID3V2_TAG = b"ID3\x03\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+ID3V1_TRAILER = b"TAG" + b"\x00" * 125
+
+
+def encoded(container: str, subtype=None) -> bytes:
+    t = np.arange(int(SECONDS * SR)) / SR
+    buffer = io.BytesIO()
+    sf.write(buffer, (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), SR, format=container, subtype=subtype)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def wav():
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(SECONDS * SR), dtype=np.float32), SR, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def test_accepts_wav(wav):
+    info = probe_audio(wav)
+    assert (info["format"], info["duration_seconds"]) == ("wav", SECONDS)
+
+
+def test_accepts_flac():
+    info = probe_audio(encoded("FLAC"))
+    assert (info["format"], info["duration_seconds"]) == ("flac", SECONDS)
+
+
+def test_accepts_mp3_with_a_xing_tag():
+    info = probe_audio(encoded("MP3", "MPEG_LAYER_III"))
+    assert info["format"] == "mp3" and info["vbr_tag"] in ("Xing", "Info")
+    # The frame count includes the encoder delay and end padding (kept in the LAME
+    # tag, which is not read), so allow three 576-sample MPEG-2 frames of slack
+    assert info["duration_seconds"] == pytest.approx(SECONDS, abs=3 * 576 / SR)
+
+
+@pytest.mark.parametrize("buffer", [
+    CBR_STREAM,
+    ID3V2_TAG + CBR_STREAM,
+    CBR_STREAM + ID3V1_TRAILER,
+], ids=["untagged", "id3v2", "id3v1"])
+def test_accepts_cbr_mp3(buffer):
+    info = probe_audio(buffer)
+    assert (info["format"], info["duration_seconds"]) == ("mp3", CBR_SECONDS)
+
+
+def test_accepts_mp3_cut_inside_its_only_frame():
+    # A single frame running past the end of the data is a truncated stream, not junk
+    info = probe_audio(CBR_FRAME[:200])
+    assert info["duration_seconds"] == round(200 * 8 / 128000, 3)
+
+
+@pytest.mark.parametrize("buffer", [
+    # Free format carries no bitrate, so frame lengths are unknowable from the header
+    (FREE_FORMAT_HEADER + b"\x00" * 413) * 20,
+    # A sync word followed by something other than another frame is a false sync
+    CBR_FRAME + b"\x12\x34" * 500,
+    CBR_HEADER[:3],
+    ID3V2_TAG,
+], ids=["free-format", "false-sync", "truncated-header", "tag-only"])
+def test_rejects_broken_mp3(buffer):
+    with pytest.raises(ProbeError):
+        probe_audio(buffer)
+
+
+def test_rejects_broken_wav(wav):
+    empty_fmt = wav[:20] + struct.pack("<HHIIHH", 1, 0, 0, 0, 0, 16) + wav[36:]
+    for buffer in (wav[:36], wav[:28], empty_fmt):
+        with pytest.raises(ProbeError):
+            probe_audio(buffer)
+
+
+def test_rejects_broken_flac():
+    flac = encoded("FLAC")
+    zero_rate = flac[:18] + bytes([0, 0, flac[20] & 0x0F]) + flac[21:]
+    for buffer in (flac[:30], zero_rate):
+        with pytest.raises(ProbeError):
+            probe_audio(buffer)
@@ -0,0 +1,166 @@
+"""
+Equivalence tests of the vectorized EnsembleClassifier
+classify() and classify_batch() against the original per-feature loop on
+random feature dicts, NaN values, zero thresholds in both directions,
+inverted indicators and clips with fewer than 5 matched features
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+from detector import EnsembleClassifier
+
+
+def baseline_classify(thresholds: Dict[str, Dict], features: Dict[str, float]) -> Tuple[str, float, Dict]:
+    """The per-feature voting loop score_matrix() replaced, kept verbatim in behavior"""
+    ai_score = 0.0
+    human_score = 0.0
+    total_weight = 0.0
+    vote_details = {}
+    matched_features = 0
+
+    for feature_name, config in thresholds.items():
+        if feature_name not in features:
+            continue
+
+        matched_features += 1
+        value = features[feature_name]
+        threshold = config['threshold']
+        direction = config['direction']
+        weight = config['weight']
+        ai_indicator = config['ai_indicator']
+
+        if direction == 'below':
+            if threshold != 0:
+                distance = (threshold - value) / abs(threshold)
+            else:
+                distance = -value if value > 0 else 1
+            indicates_ai = value < threshold
+        else:
+            if threshold != 0:
+                distance = (value - threshold) / abs(threshold)
+            else:
+                distance = value if value > 0 else -1
+            indicates_ai = value > threshold
+
+        if not ai_indicator:
+            indicates_ai = not indicates_ai
+            distance = -distance
+
+        confidence_factor = min(2.0, max(0.1, 1.0 + np.tanh(distance * 0.5)))
+        effective_weight = weight * confidence_factor
+
+        if indicates_ai:
+            ai_score += effective_weight
+        else:
+            human_score += effective_weight
+        vote_details[feature_name] = {'value': round(value, 4), 'threshold': threshold,
+                                      'vote': 'AI' if indicates_ai else 'HUMAN',
+                                      'weight': round(effective_weight, 3), 'distance': round(distance, 3)}
+        total_weight += effective_weight
+
+    if matched_features < 5:
+        return "HUMAN", 0.55, vote_details
+
+    ai_probability = ai_score / total_weight if total_weight > 0 else 0.5
+    ai_vote_count = sum(1 for v in vote_details.values() if v['vote'] == 'AI')
+    human_vote_count = sum(1 for v in vote_details.values() if v['vote'] == 'HUMAN')
+    raw_ai_ratio = ai_vote_count / max(1, ai_vote_count + human_vote_count)
+    combined_ai_prob = 0.6 * ai_probability + 0.4 * raw_ai_ratio
+
+    decision_threshold = 0.50
+    if combined_ai_prob >= decision_threshold:
+        classification = "AI_GENERATED"
+        confidence = 0.52 + (combined_ai_prob - decision_threshold) * (0.98 - 0.52) / (1.0 - decision_threshold)
+    else:
+        classification = "HUMAN"
+        confidence = 0.98 - (combined_ai_prob / decision_threshold) * (0.98 - 0.52)
+    confidence = min(0.98, max(0.52, confidence))
+
+    vote_ratio = max(ai_vote_count, human_vote_count) / max(1, ai_vote_count + human_vote_count)
+    if vote_ratio > 0.75:
+        confidence = min(0.98, confidence * 1.05)
+
+    return classification, round(confidence, 4), vote_details
+
+
+def same_details(a: Dict, b: Dict) -> bool:
+    if a.keys() != b.keys():
+        return False
+    for name in a:
+        for key in ('value', 'threshold', 'vote', 'weight', 'distance'):
+            x, y = a[name][key], b[name][key]
+            if isinstance(x, float) and np.isnan(x):
+                if not (isinstance(y, float) and np.isnan(y)):
+                    return False
+            elif x != y:
+                return False
+    return True
+
+
+def random_features(rng: np.random.RandomState, classifier: EnsembleClassifier, keep: float) -> Dict[str, float]:
+    """Values scattered around each threshold (sign flips included), some features dropped, some NaN"""
+    features = {}
+    for name, config in classifier.thresholds.items():
+        if rng.rand() > keep:
+            continue
+        scale = abs(config['threshold']) or 1.0
+        value = float(config['threshold'] + scale * rng.randn() * 1.5)
+        roll = rng.rand()
+        if roll < 0.05:
+            value = float('nan')
+        elif roll < 0.08:
+            value = float(config['threshold'])  # exactly on the threshold
+        features[name] = value
+    return features
+
+
+def assert_equivalent(classifier: EnsembleClassifier, cases):
+    for index, features in enumerate(cases):
+        expected = baseline_classify(classifier.thresholds, features)
+        got = classifier.classify(features)
+        assert got[:2] == expected[:2], f"case {index}"
+        assert same_details(expected[2], got[2]), f"case {index}"
+    expected = [baseline_classify(classifier.thresholds, features)[:2] for features in cases]
+    assert classifier.classify_batch(cases) == expected
+
+
+@pytest.fixture
+def rng():
+    return np.random.RandomState(0)
+
+
+def test_production_thresholds(rng):
+    classifier = EnsembleClassifier()
+    assert_equivalent(classifier, [random_features(rng, classifier, 0.9) for _ in range(500)])
+
+
+def test_all_nan_features():
+    # Every vote is a minimum-weight HUMAN vote
+    classifier = EnsembleClassifier()
+    assert_equivalent(classifier, [{name: float('nan') for name in classifier.thresholds}])
+
+
+def test_fewer_than_five_features(rng):
+    # Falls back to HUMAN 0.55 with the details still built
+    classifier = EnsembleClassifier()
+    cases = [{name: float(rng.randn()) for name in rng.choice(classifier.feature_names, size=count, replace=False)}
+             for count in range(6)]
+    cases.append({'not_a_feature': 1.0, 'pitch_cv': 0.01})
+    assert_equivalent(classifier, cases)
+
+
+def test_zero_thresholds_and_inverted_indicators(rng):
+    classifier = EnsembleClassifier()
+    for index, name in enumerate(classifier.feature_names[:20]):
+        classifier.thresholds[name] = dict(classifier.thresholds[name], threshold=0,
+                                           direction='above' if index % 2 else 'below')
+    for name in classifier.feature_names[20:30]:
+        classifier.thresholds[name] = dict(classifier.thresholds[name], ai_indicator=False)
+    classifier.compile()
+    cases = [random_features(rng, classifier, 0.9) for _ in range(300)]
+    cases.append({name: 0.0 for name in classifier.thresholds})
+    cases.append({name: -1.0 for name in classifier.thresholds})
+    assert_equivalent(classifier, cases)
@@ -0,0 +1,113 @@
+"""
+Detection mode tests
+Each mode reaches its engine with its analysis window; the cascade stops at a
+confident fast verdict, escalates below the margin, keeps the fast verdict
+when the full tier fails and lets fast-tier or decode errors through; cache-key
+versions change exactly with the rules they cover
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+import detector
+import detector_fast
+import modes
+from audio_decoding import DecodeError
+
+SR = 16000
+CORRUPT_WAV = b"RIFF\x00\x00\x00\x00WAVE" + b"\x00" * 6000
+
+
+@pytest.fixture
+def clip(make_wav):
+    """Gliding harmonic tone with a syllable envelope and a little noise"""
+    rng = np.random.RandomState(0)
+    t = np.arange(3 * SR) / SR
+    phase = 2 * np.pi * np.cumsum(140 + 20 * np.sin(2 * np.pi * 0.7 * t)) / SR
+    tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.abs(np.sin(2 * np.pi * 2.5 * t))
+    return make_wav(0.2 * tone * envelope + 0.01 * rng.randn(len(t)), SR)
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError("simulated tier failure")
+
+
+def test_modes_route_to_their_engine_and_window(clip, monkeypatch):
+    calls = []
+
+    def recorder(engine):
+        def detect_ai_voice(**kwargs):
+            calls.append((engine, kwargs.get("mode"), kwargs.get("max_seconds")))
+            return "HUMAN", 0.9
+        return detect_ai_voice
+
+    monkeypatch.setattr(detector_fast, "detect_ai_voice", recorder("fast"))
+    monkeypatch.setattr(detector, "detect_ai_voice", recorder("detector"))
+    tiers = [modes.detect(clip, "English", mode)[2] for mode in ("fast", "standard", "full")]
+    assert tiers == ["fast", "standard", "full"]
+    assert calls == [("fast", None, modes.MODE_ANALYSIS_SECONDS["fast"] or None),
+                     ("detector", "standard", modes.MODE_ANALYSIS_SECONDS["standard"] or None),
+                     ("detector", "full", modes.MODE_ANALYSIS_SECONDS["full"] or None)]
+
+
+def test_unknown_modes_are_rejected(clip):
+    with pytest.raises(ValueError):
+        modes.detect(clip, "English", "turbo")
+
+
+def test_cascade_stops_at_a_confident_fast_verdict(clip):
+    # A margin of 0 always trusts the fast tier
+    assert modes.detect_cascade(clip, "English", margin=0.0) == modes.detect(clip, "English", "fast")
+
+
+def test_cascade_escalates_below_the_margin(clip):
+    # A margin above 1 always escalates, on the PCM the fast tier decoded
+    y, sr = detector_fast.load_audio_fast(clip, max_seconds=modes.analysis_seconds("cascade"))
+    full = detector.detect_from_pcm(modes._window(y, sr, modes.MODE_ANALYSIS_SECONDS["full"]), sr, mode="full")
+    assert modes.detect_cascade(clip, "English", margin=1.01) == full + ("full",)
+
+
+def test_failed_full_tier_keeps_the_fast_verdict(clip, monkeypatch):
+    fast = modes.detect(clip, "English", "fast")
+    monkeypatch.setattr(detector, "detect_from_pcm", fail)
+    assert modes.detect_cascade(clip, "English", margin=1.01) == fast
+
+
+def test_failed_fast_tier_raises(clip, monkeypatch):
+    monkeypatch.setattr(detector_fast, "classify_voice", fail)
+    with pytest.raises(RuntimeError):
+        modes.detect_cascade(clip, "English", margin=1.01)
+
+
+@pytest.mark.parametrize("mode", modes.DETECTION_MODES)
+def test_undecodable_audio_raises_decode_error(mode):
+    with pytest.raises(DecodeError):
+        modes.detect(CORRUPT_WAV, "English", mode)
+
+
+def test_every_mode_has_a_distinct_stable_version():
+    versions = modes.mode_versions()
+    assert set(versions) == set(modes.DETECTION_MODES)
+    assert len(set(versions.values())) == len(versions)
+    assert modes.mode_versions() == versions
+
+
+def test_fast_rule_changes_rekey_fast_and_cascade_only(monkeypatch):
+    versions = modes.mode_versions()
+    monkeypatch.setattr(detector_fast, "THRESHOLD_VERSION", detector_fast.THRESHOLD_VERSION + "-changed")
+    modes.mode_version.cache_clear()
+    try:
+        bumped = modes.mode_versions()
+    finally:
+        monkeypatch.undo()
+        modes.mode_version.cache_clear()
+    assert {mode for mode in versions if bumped[mode] != versions[mode]} == {"fast", "cascade"}
+
+
+def test_ensemble_version_follows_the_thresholds():
+    classifier = detector.EnsembleClassifier()
+    baseline = classifier.version()
+    assert detector.EnsembleClassifier().version() == baseline
+    classifier.thresholds["pitch_cv"] = dict(classifier.thresholds["pitch_cv"], threshold=0.13)
+    assert classifier.version() != baseline
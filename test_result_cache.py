@@ -0,0 +1,77 @@
+"""
+Result cache tests
+LRU order under the entry limit, eviction to fit the byte budget, oversized
+values being skipped, TTL expiry and keys separated by mode and version
+"""
+import time
+
+from result_cache import ResultCache, _estimate_size
+
+
+def result(confidence: float) -> tuple:
+    return ("HUMAN", confidence)
+
+
+def test_entry_limit_evicts_least_recently_used():
+    cache = ResultCache(max_entries=3, max_bytes=1 << 20, ttl=60)
+    for name, confidence in (("a", 0.6), ("b", 0.7), ("c", 0.8)):
+        cache.put(name, result(confidence))
+    # Reading "a" makes "b" the oldest, so inserting "d" evicts "b"
+    cache.get("a")
+    cache.put("d", result(0.9))
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.evictions == 1
+
+
+def test_put_refreshes_an_existing_key():
+    cache = ResultCache(max_entries=3, max_bytes=1 << 20, ttl=60)
+    cache.put("a", result(0.6))
+    cache.put("a", result(0.61))
+    assert cache.get("a") == result(0.61)
+    assert cache.stats()["entries"] == 1
+
+
+def test_byte_budget_evicts_to_fit():
+    # Room for exactly two entries, so the third evicts the oldest
+    entry_size = _estimate_size("k1") + _estimate_size(result(0.6))
+    cache = ResultCache(max_entries=100, max_bytes=2 * entry_size, ttl=60)
+    for key, confidence in (("k1", 0.6), ("k2", 0.7), ("k3", 0.8)):
+        cache.put(key, result(confidence))
+    assert cache.get("k1") is None
+    assert cache.get("k2") is not None and cache.get("k3") is not None
+    assert cache.current_bytes <= cache.max_bytes
+
+    # A value bigger than the whole budget is never cached and evicts nothing
+    cache.put("huge", "x" * (4 * entry_size))
+    assert cache.get("huge") is None
+    assert cache.get("k3") is not None
+    assert cache.current_bytes == sum(size for _, size, _ in cache._entries.values())
+
+
+def test_entries_expire_after_the_ttl():
+    cache = ResultCache(max_entries=10, max_bytes=1 << 20, ttl=0.05)
+    cache.put("fresh", result(0.6))
+    assert cache.get("fresh") is not None
+    time.sleep(0.1)
+    assert cache.get("fresh") is None
+    assert cache.expirations == 1
+    assert cache.current_bytes == 0
+
+
+def test_keys_separate_modes_and_versions():
+    cache = ResultCache(max_entries=10, max_bytes=1 << 20, ttl=60)
+    cache.put(ResultCache.make_key("digest", "full", "v1"), result(0.6))
+    assert cache.get(ResultCache.make_key("digest", "full", "v2")) is None
+    assert cache.get(ResultCache.make_key("digest", "fast", "v1")) is None
+    assert cache.get(ResultCache.make_key("digest", "full", "v1")) == result(0.6)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_zero_limits_disable_the_cache():
+    for cache in (ResultCache(max_entries=0, max_bytes=1 << 20, ttl=60),
+                  ResultCache(max_entries=10, max_bytes=0, ttl=60)):
+        cache.put("a", result(0.6))
+        assert not cache.enabled
+        assert cache.get("a") is None
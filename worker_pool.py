@@ -0,0 +1,143 @@
+"""
+Process pool for CPU-bound voice detection
+Keeps the asyncio event loop responsive while clips are analyzed on other cores
+"""
+
+import os
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Pool configuration (0 workers runs detection on the default thread pool instead)
+DETECTION_WORKERS = int(os.environ.get("DETECTION_WORKERS", os.cpu_count() or 1))
+DETECTION_MAX_TASKS_PER_CHILD = int(os.environ.get("DETECTION_MAX_TASKS_PER_CHILD", "0")) or None
+DETECTION_TIMEOUT = float(os.environ.get("DETECTION_TIMEOUT", "30"))
+PRELOAD_FULL_DETECTOR = _env_flag("PRELOAD_FULL_DETECTOR", "true")
+DECODER_BENCHMARK = _env_flag("DECODER_BENCHMARK")
+
+
+def _warm_worker(preload_full: bool, benchmark: bool = False):
+    """Worker initializer: import the heavy libraries once per process"""
+    import numpy  # noqa: F401
+    import scipy.signal  # noqa: F401
+    import scipy.fft  # noqa: F401
+    try:
+        import soundfile  # noqa: F401
+    except ImportError:
+        pass
+    import audio_decoding  # noqa: F401
+    import detector_fast  # noqa: F401
+    import modes  # noqa: F401
+    if preload_full:
+        import detector  # noqa: F401  (pulls in librosa)
+    if benchmark:
+        audio_decoding.benchmark_decoders()
+
+
+def _ping() -> int:
+    """No-op task used to force worker start-up"""
+    return os.getpid()
+
+
+def detect_in_worker(audio_data: bytes, language: str, audio_hash: Optional[str] = None, mode: str = "fast",
+                     audio_format: Optional[str] = None, sample_rate: Optional[int] = None):
+    """
+    Run a detection mode inside a pool worker
+    Returns (result, decoder stats gathered in this worker since its last task)
+    """
+    from modes import detect
+    from audio_decoding import DECODER_STATS
+    result = detect(audio_data, language, mode, audio_hash, audio_format, sample_rate)
+    return result, DECODER_STATS.drain()
+
+
+class DetectionPool:
+    """
+    Pre-warmed process pool with a per-task timeout
+    Note: a timed-out task is abandoned, not killed; the worker finishes it
+    in the background, so max_tasks_per_child is a useful safety valve
+    """
+
+    def __init__(self, workers: int = DETECTION_WORKERS,
+                 max_tasks_per_child: Optional[int] = DETECTION_MAX_TASKS_PER_CHILD,
+                 timeout: float = DETECTION_TIMEOUT,
+                 preload_full: bool = PRELOAD_FULL_DETECTOR,
+                 benchmark: bool = DECODER_BENCHMARK):
+        self.workers = max(0, workers)
+        self.max_tasks_per_child = max_tasks_per_child
+        self.timeout = timeout
+        self.preload_full = preload_full
+        self.benchmark = benchmark
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Guards swapping self._executor (startup, shutdown and broken-pool replacement)
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that already runs an event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+            initargs=(self.preload_full, self.benchmark),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    def start(self):
+        """Create the pool and bring every worker up before traffic arrives"""
+        if self._executor is not None:
+            return
+        if self.workers == 0:
+            # Detection runs in this process; order its decoders here
+            if self.benchmark:
+                _warm_worker(self.preload_full, self.benchmark)
+            return
+        self._executor = self._create_executor()
+        pids = {f.result() for f in [self._executor.submit(_ping) for _ in range(self.workers)]}
+        logger.info(f"Detection pool ready: {len(pids)} warm workers, "
+                    f"max_tasks_per_child={self.max_tasks_per_child}, timeout={self.timeout}s")
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _replace(self, broken: ProcessPoolExecutor):
+        """
+        Swap a broken pool for a fresh one, unless another failed request already did:
+        shutting down the replacement would cancel requests that are running fine on it
+        """
+        with self._lock:
+            if broken is None or self._executor is not broken:
+                return
+            logger.error("Detection pool broken, restarting workers")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run fn(*args) off the event loop and wait at most self.timeout seconds
+        Raises asyncio.TimeoutError when the deadline passes
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, partial(fn, *args)), timeout=self.timeout
+            )
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a decoder); replace the pool for later requests
+            self._replace(executor)
+            raise